@@ -0,0 +1,202 @@
+"""Benchmark the delivery pipeline on synthetic exports and check for regressions.
+
+Every run also checks that the pandas and Arrow engines produce identical
+summary tables, and fails if they do not.
+
+Example:
+    python benchmark.py --rows 10000 100000 1000000
+    python benchmark.py --rows 100000 --save-baseline
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from delivery_pipeline import (
+    DC_HUB, TARGET_CUSTOMER, arrow_summaries, calculate_time_durations, create_main_summary,
+    create_shift_summary, hub_scorecard, parse_date_column, view_masks,
+)
+from delivery_report import build_report
+
+# Where generated exports are kept between runs
+EXPORT_DIR = Path(tempfile.gettempdir()) / 'delivery_benchmark'
+
+# Rows generated and written per batch, so 10M-row exports fit in memory
+GENERATE_BATCH_ROWS = 1_000_000
+
+# Stages whose time may grow by this fraction over the baseline before failing
+DEFAULT_THRESHOLD = 0.25
+
+# Timings below this many seconds are too noisy to compare
+NOISE_FLOOR_SECONDS = 0.05
+
+def generate_batch(rng, n_rows, first_awb, n_stores=300):
+    """One batch of synthetic export rows.
+    
+    Picks fall over a month with a daytime peak, durations are log-normal
+    (median about 3.5 hours with a long tail), 'Picked on' mixes two formats,
+    'Delivered on' uses day-first dates and is missing for undelivered orders.
+    """
+    hubs = np.array([DC_HUB] + [f'ST{i:03d}' for i in range(1, n_stores + 1)])
+    hub_weights = np.r_[0.25, np.full(n_stores, 0.75 / n_stores)]
+    customers = np.array([TARGET_CUSTOMER, 'OTHER RETAIL PVT LTD', 'MARKETPLACE SELLER'])
+    
+    days = rng.integers(0, 31, n_rows)
+    minutes = np.clip(rng.normal(13 * 60, 4 * 60, n_rows), 0, 24 * 60 - 1).astype(np.int64)
+    picked = pd.Timestamp('2024-09-15') + pd.to_timedelta(days, unit='D') + pd.to_timedelta(minutes, unit='min')
+    durations = pd.to_timedelta(np.round(rng.lognormal(1.25, 0.9, n_rows) * 60), unit='min')
+    delivered = picked + durations
+    
+    picked_text = picked.strftime('%m-%d-%Y %H:%M').to_numpy(dtype=object)
+    iso_rows = rng.random(n_rows) < 0.05
+    picked_text[iso_rows] = picked[iso_rows].strftime('%Y-%m-%d %H:%M')
+    delivered_text = delivered.strftime('%d-%m-%Y %H:%M').to_numpy(dtype=object)
+    delivered_text[rng.random(n_rows) < 0.08] = None
+    
+    return pd.DataFrame({
+        'AWB': np.arange(first_awb, first_awb + n_rows),
+        'Customer': rng.choice(customers, n_rows, p=[0.8, 0.15, 0.05]),
+        'Pickup Hub': rng.choice(hubs, n_rows, p=hub_weights),
+        'Picked on': picked_text,
+        'Delivered on': delivered_text,
+        'Status': rng.choice(['DELIVERED', 'RTO', 'IN TRANSIT'], n_rows, p=[0.9, 0.04, 0.06]),
+        'Weight (kg)': np.round(rng.gamma(2.0, 0.6, n_rows), 2),
+    })
+
+def generate_export(n_rows, seed=0):
+    """Path of a synthetic export with n_rows rows, generated on first use"""
+    path = EXPORT_DIR / f'export_{n_rows}_{seed}.csv'
+    if path.exists():
+        return path
+    
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', newline='') as export:
+        for first_awb in range(0, n_rows, GENERATE_BATCH_ROWS):
+            batch = generate_batch(rng, min(GENERATE_BATCH_ROWS, n_rows - first_awb), first_awb)
+            batch.to_csv(export, index=False, header=first_awb == 0)
+    tmp_path.replace(path)
+    return path
+
+def measure(stage, results, func, *args, rows_in=None, track_memory=True):
+    """Run func once, recording wall time and peak traced memory under results[stage]"""
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    output = func(*args)
+    seconds = time.perf_counter() - started
+    peak_mb = None
+    if track_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    
+    results[stage] = {'seconds': round(seconds, 4), 'peak_mb': None if peak_mb is None else round(peak_mb, 1)}
+    if rows_in is not None:
+        results[stage]['rows'] = rows_in
+    return output
+
+def run_pipeline(path, track_memory=True):
+    """Time and memory-profile each pipeline stage on one export"""
+    stages = {}
+    file_bytes = path.read_bytes()
+    
+    df = measure('read_csv', stages, lambda: pd.read_csv(io.BytesIO(file_bytes)), track_memory=track_memory)
+    rows = len(df)
+    df = measure('parse_date_column', stages, parse_date_column, df, 'Picked on', rows_in=rows, track_memory=track_memory)
+    df = measure('calculate_time_durations', stages, calculate_time_durations, df, rows_in=rows, track_memory=track_memory)
+    
+    dc_df = df[view_masks(df)['DC']]
+    measure('create_main_summary', stages, create_main_summary, dc_df, 'DC', rows_in=len(dc_df), track_memory=track_memory)
+    measure(
+        'create_shift_summary', stages, create_shift_summary, dc_df, 'Morning', 'DC',
+        rows_in=len(dc_df), track_memory=track_memory
+    )
+    measure('hub_scorecard', stages, hub_scorecard, df, rows_in=rows, track_memory=track_memory)
+    measure('arrow_summaries', stages, arrow_summaries, file_bytes, rows_in=rows, track_memory=track_memory)
+    return stages
+
+def engine_mismatches(path):
+    """Names of report tables that differ between the pandas and Arrow engines"""
+    pandas_tables = build_report(path, engine='pandas')
+    arrow_tables = build_report(path, engine='arrow')
+    return [
+        name for name in sorted(set(pandas_tables) | set(arrow_tables))
+        if name not in pandas_tables or name not in arrow_tables or not pandas_tables[name].equals(arrow_tables[name])
+    ]
+
+def compare(results, baseline, threshold):
+    """Regressions of results against baseline, as readable lines"""
+    regressions = []
+    for rows, stages in results['runs'].items():
+        for stage, current in stages.items():
+            previous = baseline.get('runs', {}).get(rows, {}).get(stage)
+            if previous is None:
+                continue
+            limit = max(previous['seconds'] * (1 + threshold), NOISE_FLOOR_SECONDS)
+            if current['seconds'] > limit:
+                regressions.append(
+                    f"{rows} rows, {stage}: {current['seconds']:.3f}s vs baseline {previous['seconds']:.3f}s"
+                )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the delivery pipeline on synthetic exports.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000], help="export sizes to run")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for the generated exports")
+    parser.add_argument('--output', default='bench_results.json', help="where to write the results")
+    parser.add_argument('--baseline', default='bench_baseline.json', help="stored results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc, which slows some stages")
+    args = parser.parse_args(argv)
+    
+    results = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'runs': {},
+    }
+    mismatches = []
+    for n_rows in args.rows:
+        path = generate_export(n_rows, args.seed)
+        stages = run_pipeline(path, track_memory=not args.no_memory)
+        results['runs'][str(n_rows)] = stages
+        for stage, stats in stages.items():
+            memory = '' if stats['peak_mb'] is None else f", peak {stats['peak_mb']:.1f} MB"
+            print(f"{n_rows:>10,} rows  {stage:<26} {stats['seconds']:8.3f}s{memory}")
+        mismatches.extend(f"{n_rows} rows, {name}" for name in engine_mismatches(path))
+    
+    for line in mismatches:
+        print(f"ENGINE MISMATCH {line}", file=sys.stderr)
+    if mismatches:
+        return 1
+    
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+        return 0
+    
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,488 +1,513 @@
-import streamlit as st
-import pandas as pd
-import numpy as np
-from datetime import datetime, date, timedelta
-
-# Configure the page
-st.set_page_config(
-    page_title="Delivery Analytics Dashboard",
-    page_icon="📊",
-    layout="wide"
-)
-
-# Title and description
-st.title("📊 Delivery Analytics Dashboard")
-st.markdown("---")
-
-# File upload
-uploaded_file = st.file_uploader("Upload your CSV file", type=['csv'])
-
-def parse_date_column(df, column_name):
-    """Parse date column with multiple possible formats"""
-    if column_name not in df.columns:
-        return df
-    
-    # Try multiple date formats
-    formats_to_try = [
-        '%m-%d-%Y %H:%M',  # MM-DD-YYYY HH:MM
-        '%m-%d-%Y',        # MM-DD-YYYY
-        '%d-%m-%Y %H:%M',  # DD-MM-YYYY HH:MM
-        '%d-%m-%Y',        # DD-MM-YYYY
-        '%Y-%m-%d %H:%M',  # YYYY-MM-DD HH:MM
-        '%Y-%m-%d',        # YYYY-MM-DD
-    ]
-    
-    for fmt in formats_to_try:
-        try:
-            parsed_dates = pd.to_datetime(df[column_name], format=fmt, errors='coerce')
-            # Check if any dates were successfully parsed
-            success_rate = (1 - parsed_dates.isna().mean()) * 100
-            if success_rate > 50:  # If more than 50% parsed successfully
-                df[column_name] = parsed_dates
-                break
-        except:
-            continue
-    else:
-        # If none of the specific formats work, use pandas default parsing
-        df[column_name] = pd.to_datetime(df[column_name], errors='coerce')
-    
-    return df
-
-def calculate_time_durations(df):
-    """Calculate time durations from Picked on to Delivered on"""
-    # Parse Delivered on column
-    df = parse_date_column(df, 'Delivered on')
-    
-    # Calculate time difference in hours
-    mask = (~df['Picked on'].isna()) & (~df['Delivered on'].isna())
-    df.loc[mask, 'delivery_duration_hrs'] = (
-        df.loc[mask, 'Delivered on'] - df.loc[mask, 'Picked on']
-    ).dt.total_seconds() / 3600
-    
-    # Categorize into new time buckets (hourly up to 12 hours, then 12+)
-    conditions = [
-        df['delivery_duration_hrs'] <= 1,
-        (df['delivery_duration_hrs'] > 1) & (df['delivery_duration_hrs'] <= 2),
-        (df['delivery_duration_hrs'] > 2) & (df['delivery_duration_hrs'] <= 3),
-        (df['delivery_duration_hrs'] > 3) & (df['delivery_duration_hrs'] <= 4),
-        (df['delivery_duration_hrs'] > 4) & (df['delivery_duration_hrs'] <= 5),
-        (df['delivery_duration_hrs'] > 5) & (df['delivery_duration_hrs'] <= 6),
-        (df['delivery_duration_hrs'] > 6) & (df['delivery_duration_hrs'] <= 7),
-        (df['delivery_duration_hrs'] > 7) & (df['delivery_duration_hrs'] <= 8),
-        (df['delivery_duration_hrs'] > 8) & (df['delivery_duration_hrs'] <= 9),
-        (df['delivery_duration_hrs'] > 9) & (df['delivery_duration_hrs'] <= 10),
-        (df['delivery_duration_hrs'] > 10) & (df['delivery_duration_hrs'] <= 11),
-        (df['delivery_duration_hrs'] > 11) & (df['delivery_duration_hrs'] <= 12),
-        df['delivery_duration_hrs'] > 12
-    ]
-    
-    choices = [
-        '0-1Hrs', '1-2Hrs', '2-3Hrs', '3-4Hrs', '4-5Hrs', '5-6Hrs',
-        '6-7Hrs', '7-8Hrs', '8-9Hrs', '9-10Hrs', '10-11Hrs', '11-12Hrs', '12+Hrs'
-    ]
-    df['delivery_time_bucket'] = np.select(conditions, choices, default='Unknown')
-    
-    return df
-
-def create_main_summary(df, tab_name):
-    """Create main summary table with totals and percentages"""
-    if not df.empty:
-        # Extract date and time components
-        df['Picked Date'] = df['Picked on'].dt.date
-        df['Picked Hour'] = df['Picked on'].dt.hour
-        
-        # Generate all dates from September 20th to October 10th
-        current_year = int(df['Picked on'].dt.year.max())
-        september_start = pd.Timestamp(f'{current_year}-09-20')
-        october_end = pd.Timestamp(f'{current_year}-10-10')
-        
-        all_dates = pd.date_range(start=september_start, end=october_end, freq='D')
-        
-        # Group by date and calculate metrics
-        main_summary = []
-        
-        for single_date in all_dates:
-            date_str = single_date.strftime('%m-%d')
-            day_data = df[df['Picked Date'] == single_date.date()]
-            total = len(day_data)
-            
-            if total == 0:
-                # Skip dates with no data
-                continue
-            
-            # Morning shift (12AM to 11:59AM)
-            morning_shift = len(day_data[
-                (day_data['Picked Hour'] >= 0) & 
-                (day_data['Picked Hour'] < 12)
-            ])
-            
-            # Afternoon slot (12PM to 11:59PM)
-            afternoon_slot = len(day_data[
-                (day_data['Picked Hour'] >= 12)
-            ])
-            
-            # Time duration buckets for all orders
-            time_buckets = day_data['delivery_time_bucket'].value_counts()
-            hrs_0_1 = time_buckets.get('0-1Hrs', 0)
-            hrs_1_2 = time_buckets.get('1-2Hrs', 0)
-            hrs_2_3 = time_buckets.get('2-3Hrs', 0)
-            hrs_3_4 = time_buckets.get('3-4Hrs', 0)
-            hrs_4_5 = time_buckets.get('4-5Hrs', 0)
-            hrs_5_6 = time_buckets.get('5-6Hrs', 0)
-            hrs_6_7 = time_buckets.get('6-7Hrs', 0)
-            hrs_7_8 = time_buckets.get('7-8Hrs', 0)
-            hrs_8_9 = time_buckets.get('8-9Hrs', 0)
-            hrs_9_10 = time_buckets.get('9-10Hrs', 0)
-            hrs_10_11 = time_buckets.get('10-11Hrs', 0)
-            hrs_11_12 = time_buckets.get('11-12Hrs', 0)
-            hrs_12_plus = time_buckets.get('12+Hrs', 0)
-            
-            # Calculate average delivery time
-            avg_delivery_time = day_data['delivery_duration_hrs'].mean()
-            
-            # Calculate percentages
-            morning_pct = round((morning_shift / total * 100) if total > 0 else 0, 0)
-            afternoon_pct = round((afternoon_slot / total * 100) if total > 0 else 0, 0)
-            
-            main_summary.append({
-                tab_name: date_str,
-                'Total': total,
-                'Morning shift': morning_shift,
-                'Afternoon Slot': afternoon_slot,
-                'Morning %': f"{int(morning_pct)}%",
-                'Afternoon %': f"{int(afternoon_pct)}%",
-                '0-1Hrs': hrs_0_1,
-                '1-2Hrs': hrs_1_2,
-                '2-3Hrs': hrs_2_3,
-                '3-4Hrs': hrs_3_4,
-                '4-5Hrs': hrs_4_5,
-                '5-6Hrs': hrs_5_6,
-                '6-7Hrs': hrs_6_7,
-                '7-8Hrs': hrs_7_8,
-                '8-9Hrs': hrs_8_9,
-                '9-10Hrs': hrs_9_10,
-                '10-11Hrs': hrs_10_11,
-                '11-12Hrs': hrs_11_12,
-                '12+Hrs': hrs_12_plus,
-                'Avg Hrs': round(avg_delivery_time, 1) if not np.isnan(avg_delivery_time) else 0
-            })
-        
-        # Calculate totals for main summary
-        if main_summary:
-            total_orders = sum(item['Total'] for item in main_summary)
-            total_morning = sum(item['Morning shift'] for item in main_summary)
-            total_afternoon = sum(item['Afternoon Slot'] for item in main_summary)
-            
-            # Calculate totals for time buckets
-            total_0_1 = sum(item['0-1Hrs'] for item in main_summary)
-            total_1_2 = sum(item['1-2Hrs'] for item in main_summary)
-            total_2_3 = sum(item['2-3Hrs'] for item in main_summary)
-            total_3_4 = sum(item['3-4Hrs'] for item in main_summary)
-            total_4_5 = sum(item['4-5Hrs'] for item in main_summary)
-            total_5_6 = sum(item['5-6Hrs'] for item in main_summary)
-            total_6_7 = sum(item['6-7Hrs'] for item in main_summary)
-            total_7_8 = sum(item['7-8Hrs'] for item in main_summary)
-            total_8_9 = sum(item['8-9Hrs'] for item in main_summary)
-            total_9_10 = sum(item['9-10Hrs'] for item in main_summary)
-            total_10_11 = sum(item['10-11Hrs'] for item in main_summary)
-            total_11_12 = sum(item['11-12Hrs'] for item in main_summary)
-            total_12_plus = sum(item['12+Hrs'] for item in main_summary)
-            
-            # Calculate overall average
-            all_delivery_times = df['delivery_duration_hrs'].dropna()
-            overall_avg = round(all_delivery_times.mean(), 1) if len(all_delivery_times) > 0 else 0
-            
-            total_summary = {
-                tab_name: 'TOTAL',
-                'Total': total_orders,
-                'Morning shift': total_morning,
-                'Afternoon Slot': total_afternoon,
-                'Morning %': f"{int(round((total_morning / total_orders * 100) if total_orders > 0 else 0, 0))}%",
-                'Afternoon %': f"{int(round((total_afternoon / total_orders * 100) if total_orders > 0 else 0, 0))}%",
-                '0-1Hrs': total_0_1,
-                '1-2Hrs': total_1_2,
-                '2-3Hrs': total_2_3,
-                '3-4Hrs': total_3_4,
-                '4-5Hrs': total_4_5,
-                '5-6Hrs': total_5_6,
-                '6-7Hrs': total_6_7,
-                '7-8Hrs': total_7_8,
-                '8-9Hrs': total_8_9,
-                '9-10Hrs': total_9_10,
-                '10-11Hrs': total_10_11,
-                '11-12Hrs': total_11_12,
-                '12+Hrs': total_12_plus,
-                'Avg Hrs': overall_avg
-            }
-            
-            return main_summary, total_summary
-        else:
-            return [], {}
-    else:
-        return [], {}
-
-def create_shift_summary(df, shift_type, tab_name):
-    """Create summary table for specific shift (Morning or Afternoon)"""
-    if not df.empty:
-        # Extract date and time components
-        df['Picked Date'] = df['Picked on'].dt.date
-        df['Picked Hour'] = df['Picked on'].dt.hour
-        
-        # Filter by shift type
-        if shift_type == 'Morning':
-            shift_df = df[(df['Picked Hour'] >= 0) & (df['Picked Hour'] < 12)]
-        else:  # Afternoon
-            shift_df = df[(df['Picked Hour'] >= 12)]
-        
-        # Generate all dates from September 20th to October 10th
-        current_year = int(df['Picked on'].dt.year.max())
-        september_start = pd.Timestamp(f'{current_year}-09-20')
-        october_end = pd.Timestamp(f'{current_year}-10-10')
-        
-        all_dates = pd.date_range(start=september_start, end=october_end, freq='D')
-        
-        # Group by date and calculate metrics
-        shift_summary = []
-        
-        for single_date in all_dates:
-            date_str = single_date.strftime('%m-%d')
-            day_data = shift_df[shift_df['Picked Date'] == single_date.date()]
-            total = len(day_data)
-            
-            if total == 0:
-                # Skip dates with no data
-                continue
-            
-            # Time duration buckets
-            time_buckets = day_data['delivery_time_bucket'].value_counts()
-            hrs_0_1 = time_buckets.get('0-1Hrs', 0)
-            hrs_1_2 = time_buckets.get('1-2Hrs', 0)
-            hrs_2_3 = time_buckets.get('2-3Hrs', 0)
-            hrs_3_4 = time_buckets.get('3-4Hrs', 0)
-            hrs_4_5 = time_buckets.get('4-5Hrs', 0)
-            hrs_5_6 = time_buckets.get('5-6Hrs', 0)
-            hrs_6_7 = time_buckets.get('6-7Hrs', 0)
-            hrs_7_8 = time_buckets.get('7-8Hrs', 0)
-            hrs_8_9 = time_buckets.get('8-9Hrs', 0)
-            hrs_9_10 = time_buckets.get('9-10Hrs', 0)
-            hrs_10_11 = time_buckets.get('10-11Hrs', 0)
-            hrs_11_12 = time_buckets.get('11-12Hrs', 0)
-            hrs_12_plus = time_buckets.get('12+Hrs', 0)
-            
-            # Calculate average delivery time
-            avg_delivery_time = day_data['delivery_duration_hrs'].mean()
-            
-            shift_summary.append({
-                tab_name: date_str,
-                'Total': total,
-                '0-1Hrs': hrs_0_1,
-                '1-2Hrs': hrs_1_2,
-                '2-3Hrs': hrs_2_3,
-                '3-4Hrs': hrs_3_4,
-                '4-5Hrs': hrs_4_5,
-                '5-6Hrs': hrs_5_6,
-                '6-7Hrs': hrs_6_7,
-                '7-8Hrs': hrs_7_8,
-                '8-9Hrs': hrs_8_9,
-                '9-10Hrs': hrs_9_10,
-                '10-11Hrs': hrs_10_11,
-                '11-12Hrs': hrs_11_12,
-                '12+Hrs': hrs_12_plus,
-                'Avg Hrs': round(avg_delivery_time, 1) if not np.isnan(avg_delivery_time) else 0
-            })
-        
-        # Calculate totals for shift summary
-        if shift_summary:
-            total_orders = sum(item['Total'] for item in shift_summary)
-            
-            # Calculate totals for time buckets
-            total_0_1 = sum(item['0-1Hrs'] for item in shift_summary)
-            total_1_2 = sum(item['1-2Hrs'] for item in shift_summary)
-            total_2_3 = sum(item['2-3Hrs'] for item in shift_summary)
-            total_3_4 = sum(item['3-4Hrs'] for item in shift_summary)
-            total_4_5 = sum(item['4-5Hrs'] for item in shift_summary)
-            total_5_6 = sum(item['5-6Hrs'] for item in shift_summary)
-            total_6_7 = sum(item['6-7Hrs'] for item in shift_summary)
-            total_7_8 = sum(item['7-8Hrs'] for item in shift_summary)
-            total_8_9 = sum(item['8-9Hrs'] for item in shift_summary)
-            total_9_10 = sum(item['9-10Hrs'] for item in shift_summary)
-            total_10_11 = sum(item['10-11Hrs'] for item in shift_summary)
-            total_11_12 = sum(item['11-12Hrs'] for item in shift_summary)
-            total_12_plus = sum(item['12+Hrs'] for item in shift_summary)
-            
-            # Calculate overall average for this shift
-            shift_delivery_times = shift_df['delivery_duration_hrs'].dropna()
-            overall_avg = round(shift_delivery_times.mean(), 1) if len(shift_delivery_times) > 0 else 0
-            
-            total_summary = {
-                tab_name: 'TOTAL',
-                'Total': total_orders,
-                '0-1Hrs': total_0_1,
-                '1-2Hrs': total_1_2,
-                '2-3Hrs': total_2_3,
-                '3-4Hrs': total_3_4,
-                '4-5Hrs': total_4_5,
-                '5-6Hrs': total_5_6,
-                '6-7Hrs': total_6_7,
-                '7-8Hrs': total_7_8,
-                '8-9Hrs': total_8_9,
-                '9-10Hrs': total_9_10,
-                '10-11Hrs': total_10_11,
-                '11-12Hrs': total_11_12,
-                '12+Hrs': total_12_plus,
-                'Avg Hrs': overall_avg
-            }
-            
-            return shift_summary, total_summary
-        else:
-            return [], {}
-    else:
-        return [], {}
-
-if uploaded_file is not None:
-    try:
-        # Read the CSV file
-        df = pd.read_csv(uploaded_file)
-        
-        # Parse Picked on column with multiple format attempts
-        df = parse_date_column(df, 'Picked on')
-        
-        # Create only the two tabs you want
-        tab1, tab2 = st.tabs([
-            "DC Analysis - WESTSIDE UNIT OF TRENT LIMITED", 
-            "Store Analysis - All Pickup Hubs (Excluding WD27)"
-        ])
-        
-        with tab1:
-            # Filter for WESTSIDE UNIT OF TRENT LIMITED and WD27
-            dc_df = df.copy()
-            
-            # Apply filters
-            if 'Customer' in dc_df.columns:
-                dc_df = dc_df[dc_df['Customer'] == 'WESTSIDE UNIT OF TRENT LIMITED']
-            
-            if 'Pickup Hub' in dc_df.columns:
-                dc_df = dc_df[dc_df['Pickup Hub'] == 'WD27']
-            
-            # Set date range: September 20th to October 10th
-            if not dc_df.empty and not dc_df['Picked on'].isna().all():
-                # Filter for dates from September 20th to October 10th
-                current_year = int(dc_df['Picked on'].dt.year.max())
-                september_start = pd.Timestamp(f'{current_year}-09-20')
-                october_end = pd.Timestamp(f'{current_year}-10-10')
-                
-                dc_df = dc_df[
-                    (dc_df['Picked on'] >= september_start) & 
-                    (dc_df['Picked on'] <= october_end + timedelta(days=1))
-                ]
-                
-                if not dc_df.empty:
-                    # Calculate time durations
-                    dc_df = calculate_time_durations(dc_df)
-                    
-                    # Create main summary
-                    st.subheader("DC Summary")
-                    main_summary, main_total = create_main_summary(dc_df, 'DC')
-                    
-                    if main_summary:
-                        # Display the Main Summary table
-                        display_df = pd.DataFrame(main_summary + [main_total])
-                        st.dataframe(display_df, use_container_width=True)
-                        
-                        # Create two columns for shift summaries
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.subheader("Morning Shift Orders")
-                            morning_summary, morning_total = create_shift_summary(dc_df, 'Morning', 'DC')
-                            if morning_summary:
-                                morning_df = pd.DataFrame(morning_summary + [morning_total])
-                                st.dataframe(morning_df, use_container_width=True)
-                            else:
-                                st.info("No morning shift data available")
-                        
-                        with col2:
-                            st.subheader("Afternoon Slot Orders")
-                            afternoon_summary, afternoon_total = create_shift_summary(dc_df, 'Afternoon', 'DC')
-                            if afternoon_summary:
-                                afternoon_df = pd.DataFrame(afternoon_summary + [afternoon_total])
-                                st.dataframe(afternoon_df, use_container_width=True)
-                            else:
-                                st.info("No afternoon slot data available")
-                    else:
-                        st.warning("No data found for the date range!")
-                    
-                else:
-                    st.warning("No data found after date filtering!")
-            else:
-                st.warning("No data found for the specified customer and hub filters!")
-        
-        with tab2:
-            # Filter for WESTSIDE UNIT OF TRENT LIMITED and EXCLUDE WD27
-            store_df = df.copy()
-            
-            # Apply filters
-            if 'Customer' in store_df.columns:
-                store_df = store_df[store_df['Customer'] == 'WESTSIDE UNIT OF TRENT LIMITED']
-            
-            if 'Pickup Hub' in store_df.columns:
-                store_df = store_df[store_df['Pickup Hub'] != 'WD27']
-            
-            # Set date range: September 20th to October 10th
-            if not store_df.empty and not store_df['Picked on'].isna().all():
-                # Filter for dates from September 20th to October 10th
-                current_year = int(store_df['Picked on'].dt.year.max())
-                september_start = pd.Timestamp(f'{current_year}-09-20')
-                october_end = pd.Timestamp(f'{current_year}-10-10')
-                
-                store_df = store_df[
-                    (store_df['Picked on'] >= september_start) & 
-                    (store_df['Picked on'] <= october_end + timedelta(days=1))
-                ]
-                
-                if not store_df.empty:
-                    # Calculate time durations
-                    store_df = calculate_time_durations(store_df)
-                    
-                    # Create main summary
-                    st.subheader("Store Summary")
-                    main_summary, main_total = create_main_summary(store_df, 'Store')
-                    
-                    if main_summary:
-                        # Display the Main Summary table
-                        display_df = pd.DataFrame(main_summary + [main_total])
-                        st.dataframe(display_df, use_container_width=True)
-                        
-                        # Create two columns for shift summaries
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.subheader("Morning Shift Orders")
-                            morning_summary, morning_total = create_shift_summary(store_df, 'Morning', 'Store')
-                            if morning_summary:
-                                morning_df = pd.DataFrame(morning_summary + [morning_total])
-                                st.dataframe(morning_df, use_container_width=True)
-                            else:
-                                st.info("No morning shift data available")
-                        
-                        with col2:
-                            st.subheader("Afternoon Slot Orders")
-                            afternoon_summary, afternoon_total = create_shift_summary(store_df, 'Afternoon', 'Store')
-                            if afternoon_summary:
-                                afternoon_df = pd.DataFrame(afternoon_summary + [afternoon_total])
-                                st.dataframe(afternoon_df, use_container_width=True)
-                            else:
-                                st.info("No afternoon slot data available")
-                    else:
-                        st.warning("No data found for the date range!")
-                    
-                else:
-                    st.warning("No data found after date filtering!")
-            else:
-                st.warning("No data found for the specified customer and hub filters!")
-            
-    except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
-
-else:
-    st.info("Please upload a CSV file to get started")
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import pandas as pd
+import numpy as np
+from datetime import datetime, date, timedelta
+from delivery_pipeline import (
+    DEFAULT_BUCKET_EDGES, DROP_DIR, ENGINES, SCORECARD_MIN_ORDERS, aggregate_cube, arrow_table_summaries, content_hash, cube_breakdown,
+    date_parse_report, day_number, default_window, delivery_percentiles, hub_scorecard, ingest_into_store,
+    last_day, memory_report, parse_bucket_edges, prepare_dataset, read_store, store_pick_dates,
+    merge_aggregates, rank_scorecard, read_arrow_export, store_version, stream_summaries, summary_tables, view_masks, window_slice,
+    DropFolderWatcher, LiveDataset, ParsedUploadCache, StageRecorder, UploadDatasets, DISABLED_RECORDER,
+)
+
+# Upper bound on memory used by parsed uploads cached across all sessions
+PARSED_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Upload selections whose prepared rows and rollup cube are kept for every session
+UPLOAD_DATASET_MAX_ENTRIES = 8
+
+# Threads parsing newly selected uploads at the same time
+UPLOAD_PARSE_WORKERS = min(8, os.cpu_count() or 1)
+
+# How often an open dashboard checks the drop folder watcher for new exports
+WATCH_REFRESH_SECONDS = 5
+
+# Titles of the DC and Store views
+VIEW_LABELS = {
+    'DC': "DC Analysis - WESTSIDE UNIT OF TRENT LIMITED",
+    'Store': "Store Analysis - All Pickup Hubs (Excluding WD27)",
+}
+
+# Scorecard columns the hub and customer ranking can be ordered by, largest first
+SCORECARD_RANK_COLUMNS = ['p90 Hrs', 'p99 Hrs', 'Avg Hrs', 'Orders']
+
+# Configure the page
+st.set_page_config(
+    page_title="Delivery Analytics Dashboard",
+    page_icon="📊",
+    layout="wide"
+)
+
+# Title and description
+st.title("📊 Delivery Analytics Dashboard")
+st.markdown("---")
+
+# Data source: a fresh upload, exports already saved to the local store, or a watched drop folder
+data_source = st.radio("Data source", ["Upload CSV", "Local store", "Watch folder"], horizontal=True)
+
+uploaded_files = []
+drop_dir = None
+save_to_store = False
+stream_upload = False
+if data_source == "Upload CSV":
+    uploaded_files = st.file_uploader(
+        "Upload your CSV files",
+        type=['csv'],
+        accept_multiple_files=True,
+        help="Exports are merged into one dataset, keeping the latest copy of each order (AWB)"
+    )
+    save_to_store = st.checkbox("Save uploads to the local store")
+    stream_upload = st.checkbox(
+        "Streaming mode for large exports",
+        help="Reads the files in chunks and keeps only running totals. "
+             "Uploads are not cached, de-duplicated or saved to the store."
+    )
+elif data_source == "Watch folder":
+    drop_dir = st.text_input(
+        "Drop folder",
+        value=str(DROP_DIR),
+        help="CSV exports saved here are added to the local store and shown within seconds"
+    ) or None
+
+@st.cache_resource
+def get_parsed_upload_cache():
+    """Parsed upload cache shared by every session of this server process"""
+    return ParsedUploadCache(PARSED_CACHE_MAX_BYTES)
+
+@st.cache_data(show_spinner="Reading local store...")
+def load_store_window(start_date, end_date, version):
+    """read_store cached per window and store version"""
+    return read_store(start_date, end_date)
+
+@st.cache_resource
+def get_upload_datasets():
+    """Prepared upload selections shared by every session of this server process"""
+    return UploadDatasets(UPLOAD_DATASET_MAX_ENTRIES)
+
+@st.cache_resource(max_entries=8, show_spinner="Preparing dataset...")
+def prepared_dataset(dataset_key, edges, _df, _recorder=DISABLED_RECORDER):
+    """prepare_dataset built once per dataset and bucket edges, shared by every session"""
+    return prepare_dataset(_df, edges, _recorder)
+
+@st.cache_resource
+def enable_stage_logging():
+    """Send the pipeline's stage records to stderr, once per server process"""
+    stage_logger = logging.getLogger('delivery_pipeline')
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    stage_logger.addHandler(handler)
+    stage_logger.setLevel(logging.INFO)
+    return stage_logger
+
+@st.cache_resource(show_spinner=False)
+def folder_watcher(drop_dir):
+    """DropFolderWatcher feeding a LiveDataset, one per folder for the server process"""
+    return DropFolderWatcher(drop_dir, LiveDataset()).start()
+
+@st.cache_resource(max_entries=32, show_spinner="Aggregating with Arrow...")
+def arrow_view_aggregates(file_keys, edges, _payloads):
+    """arrow_table_summaries of the selected exports merged, computed once per selection and bucket edges"""
+    return arrow_table_summaries([read_arrow_export(file_bytes) for file_bytes in _payloads], edges)
+
+@st.fragment(run_every=WATCH_REFRESH_SECONDS)
+def refresh_on_new_exports(live, shown_version):
+    """Rerun the page once the watcher has merged exports newer than the ones shown"""
+    if live.version != shown_version:
+        st.rerun()
+
+def upload_dataset(uploaded_files, edges, recorder=DISABLED_RECORDER):
+    """LiveDataset of the selected files, shared by every session selecting the same exports.
+    
+    Selecting more files prepares just the new exports and folds their cubes
+    into a copy of the running cube; removing one goes back to the shorter
+    selection when it is still cached, or merges again from the parse cache.
+    """
+    payloads = {}
+    for uploaded_file in uploaded_files:
+        file_bytes = uploaded_file.getvalue()
+        payloads.setdefault(content_hash(file_bytes), file_bytes)
+    
+    def load_exports(pending):
+        parsed_cache = get_parsed_upload_cache()
+        if len(pending) == 1:
+            return [parsed_cache.get_or_parse(payloads[pending[0]], pending[0], recorder)]
+        # Each export is parsed on its own thread; pandas releases the GIL while tokenizing
+        with recorder.stage('parse_uploads') as record:
+            with ThreadPoolExecutor(max_workers=min(UPLOAD_PARSE_WORKERS, len(pending))) as pool:
+                frames = list(pool.map(lambda key: parsed_cache.get_or_parse(payloads[key], key), pending))
+            record['rows_out'] = sum(len(df) for df in frames)
+        return frames
+    
+    return get_upload_datasets().get_or_build(edges, list(payloads), load_exports, recorder)
+
+def select_date_window(first_day, latest_day, key):
+    """Sidebar date range picker, preselecting default_window(latest_day); returns (start_date, end_date)"""
+    default_start, default_end = default_window(latest_day)
+    selected = st.sidebar.date_input(
+        "Date range",
+        value=(default_start.date(), default_end.date()),
+        key=key,
+        help=f"Data covers {pd.Timestamp(first_day):%Y-%m-%d} to {pd.Timestamp(latest_day):%Y-%m-%d}"
+    )
+    if len(selected) == 1:
+        # Still picking the end of the range
+        selected = (selected[0], selected[0])
+    start_date, end_date = sorted(selected)
+    return pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+def summary_column_config(tab_name):
+    """Display formats for build_summary frames; the data itself stays numeric"""
+    config = {
+        tab_name: st.column_config.DateColumn(tab_name, format="MM-DD"),
+        'Avg Hrs': st.column_config.NumberColumn('Avg Hrs', format="%.1f"),
+    }
+    for column_name in ('Morning %', 'Afternoon %'):
+        config[column_name] = st.column_config.NumberColumn(column_name, format="%d%%")
+    return config
+
+def show_summary_table(table, tab_name):
+    """Render one (rows, total) pair from summary_tables, the TOTAL row right under the days"""
+    rows, total = table
+    column_config = summary_column_config(tab_name)
+    st.dataframe(rows, use_container_width=True, hide_index=True, column_config=column_config)
+    st.dataframe(
+        total, use_container_width=True, hide_index=True,
+        column_config={**column_config, tab_name: st.column_config.TextColumn(tab_name)}
+    )
+
+def compute_summary_tables(agg, tab_name, start_date, end_date, recorder=DISABLED_RECORDER):
+    """summary_tables of one view, timed as a stage"""
+    with recorder.stage(f'summary_tables {tab_name}') as record:
+        tables = summary_tables(agg, tab_name, start_date, end_date)
+        record['rows_out'] = sum(len(table[0]) for table in tables.values() if table is not None)
+    return tables
+
+def show_summary_tables(tables, tab_name):
+    """Render the main, morning and afternoon tables of one view from summary_tables"""
+    st.subheader(f"{tab_name} Summary")
+    if tables['Summary'] is None:
+        st.warning("No data found for the date range!")
+        return
+    
+    show_summary_table(tables['Summary'], tab_name)
+    
+    col1, col2 = st.columns(2)
+    for col, shift_type, title in ((col1, 'Morning', "Morning Shift Orders"), (col2, 'Afternoon', "Afternoon Slot Orders")):
+        with col:
+            st.subheader(title)
+            if tables[shift_type] is not None:
+                show_summary_table(tables[shift_type], tab_name)
+            else:
+                st.info(f"No {'morning shift' if shift_type == 'Morning' else 'afternoon slot'} data available")
+
+def select_view():
+    """Switch between the DC and Store views; only the chosen view is computed"""
+    return st.radio("View", list(VIEW_LABELS), format_func=VIEW_LABELS.get, horizontal=True, key="view")
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def memoized_section(section_key, _compute):
+    """Result of _compute for one dashboard section, memoized on section_key.
+    
+    section_key must name everything the result depends on: dataset, bucket
+    edges, window, view, hub and the section's own options.
+    """
+    return _compute()
+
+@st.fragment
+def drilldown_section(section_key, window_cube, cube_mask, view):
+    """Hub or hour breakdown of one view, computed only while switched on; its widgets rerun just this section"""
+    if not st.toggle("Hub and hour drill-down", key=f"show_drilldown_{view}"):
+        return
+    breakdown_options = ['Pickup Hub', 'Picked Hour'] if 'Pickup Hub' in window_cube.columns else ['Picked Hour']
+    by = st.radio("Break down by", breakdown_options, horizontal=True, key=f"drilldown_{view}")
+    breakdown = memoized_section(
+        section_key + ('breakdown', by), lambda: cube_breakdown(window_cube, cube_mask, by)
+    )
+    st.dataframe(breakdown, use_container_width=True)
+
+@st.fragment
+def percentiles_section(section_key, row_slices, view, hub, recorder=DISABLED_RECORDER):
+    """Delivery time percentiles of one view, computed only while switched on; its widgets rerun just this section"""
+    if not st.toggle("Delivery time percentiles", key=f"show_percentiles_{view}"):
+        return
+    group_options = ['Day', 'Shift', 'Hub'] if 'Pickup Hub' in row_slices[0].columns else ['Day', 'Shift']
+    group_by = st.radio("Group by", group_options, horizontal=True, key=f"percentiles_{view}")
+    
+    def compute():
+        # The window's rows are only combined and masked when this section is open
+        rows = pd.concat(row_slices, ignore_index=True) if len(row_slices) > 1 else row_slices[0]
+        row_mask = view_masks(rows)[view]
+        if hub is not None:
+            row_mask = row_mask & (rows['Pickup Hub'] == hub).to_numpy()
+        with recorder.stage(f'delivery_percentiles {view}', rows_in=int(row_mask.sum())) as record:
+            percentiles = delivery_percentiles(rows, row_mask, group_by)
+            record['rows_out'] = len(percentiles)
+        return percentiles
+    
+    st.dataframe(
+        memoized_section(section_key + ('percentiles', group_by), compute),
+        use_container_width=True,
+        column_config={'Day': st.column_config.DateColumn('Day', format="MM-DD")}
+    )
+
+@st.fragment
+def scorecard_section(window_key, row_slices, recorder=DISABLED_RECORDER):
+    """Every pickup hub and customer in the window side by side, ranked; its widgets rerun just this section"""
+    if not st.toggle("Hub and customer scorecard", key="show_scorecard"):
+        return
+    col1, col2 = st.columns(2)
+    rank_by = col1.selectbox("Rank by", SCORECARD_RANK_COLUMNS, key="scorecard_rank")
+    min_orders = col2.number_input(
+        "Minimum orders",
+        min_value=0,
+        value=SCORECARD_MIN_ORDERS,
+        step=10,
+        key="scorecard_min_orders",
+        help="Hub and customer pairs with fewer orders in the window are not ranked"
+    )
+    
+    def compute():
+        rows = pd.concat(row_slices, ignore_index=True) if len(row_slices) > 1 else row_slices[0]
+        with recorder.stage('hub_scorecard', rows_in=len(rows)) as record:
+            scorecard = hub_scorecard(rows)
+            record['rows_out'] = len(scorecard)
+        return scorecard
+    
+    scorecard = memoized_section(window_key + ('scorecard',), compute)
+    if scorecard.empty:
+        st.info("No orders in the date range")
+        return
+    column_config = {
+        column_name: st.column_config.NumberColumn(column_name, format="%.0f%%" if column_name.endswith('%') else "%.1f")
+        for column_name in scorecard.columns if column_name.endswith(('%', 'Hrs'))
+    }
+    ranked = rank_scorecard(scorecard, rank_by, min_orders)
+    st.dataframe(ranked, use_container_width=True, hide_index=True, column_config=column_config)
+    if len(ranked) < len(scorecard):
+        st.caption(f"{len(scorecard) - len(ranked):,} pairs with fewer than {min_orders:,} orders are not ranked")
+
+def show_diagnostics(recorder):
+    """Collapsible table of the stages recorded during this run"""
+    if not recorder.enabled:
+        return
+    with st.expander("Diagnostics", expanded=True):
+        report = recorder.report()
+        if report.empty:
+            st.caption("No stages ran")
+            return
+        st.dataframe(report, use_container_width=True, hide_index=True)
+        st.caption(f"{report['seconds'].sum():.3f}s across {len(report)} stages; cached stages do not appear")
+
+# Delivery time buckets are configurable so SLA tiers can change without code changes
+bucket_edges_text = st.sidebar.text_input(
+    "SLA bucket edges (hours)",
+    value=", ".join(f"{edge:g}" for edge in DEFAULT_BUCKET_EDGES),
+    help="Upper edge of each bucket, e.g. 0.5, 1, 1.5, 2 for 30-minute tiers or 12, 24, 48 for long tails"
+)
+try:
+    bucket_edges = parse_bucket_edges(bucket_edges_text)
+except ValueError:
+    st.sidebar.error("Bucket edges must be positive numbers separated by commas. Using hourly buckets.")
+    bucket_edges = DEFAULT_BUCKET_EDGES
+
+# Engine behind the summary tables of uploads; both give the same numbers
+engine = 'pandas'
+if data_source == "Upload CSV":
+    engine = st.sidebar.radio(
+        "Summary engine",
+        ENGINES,
+        format_func={'pandas': "pandas", 'arrow': "Arrow compute"}.get,
+        help="Arrow reads and aggregates the exports with multithreaded Arrow kernels. "
+             "It has no drill-down panels."
+    )
+
+# Opt-in timing of each pipeline stage; off by default so normal runs pay nothing
+diagnostics_enabled = st.sidebar.checkbox(
+    "Diagnostics",
+    help="Time each pipeline stage, show the results below and log them as JSON lines"
+)
+trace_memory = diagnostics_enabled and st.sidebar.checkbox(
+    "Trace peak memory",
+    help="Uses tracemalloc, which slows the traced stages down noticeably"
+)
+recorder = StageRecorder(enabled=diagnostics_enabled, track_memory=trace_memory)
+if diagnostics_enabled:
+    enable_stage_logging()
+
+stored_dates = store_pick_dates() if data_source == "Local store" else []
+
+if uploaded_files and (stream_upload or engine == 'arrow'):
+    try:
+        view_aggregates = {'DC': None, 'Store': None}
+        if stream_upload:
+            # Fold each export into running aggregates chunk by chunk
+            with recorder.stage('stream_summaries'):
+                for uploaded_file in uploaded_files:
+                    uploaded_file.seek(0)
+                    for view, agg in stream_summaries(uploaded_file, bucket_edges).items():
+                        view_aggregates[view] = merge_aggregates(view_aggregates[view], agg)
+        else:
+            # The exports are read and merged into one Arrow table, keeping the latest copy of each order, then grouped
+            payloads = {}
+            for uploaded_file in uploaded_files:
+                file_bytes = uploaded_file.getvalue()
+                payloads.setdefault(content_hash(file_bytes), file_bytes)
+            with recorder.stage('arrow_summaries'):
+                view_aggregates = arrow_view_aggregates(tuple(payloads), tuple(bucket_edges), list(payloads.values()))
+        
+        # The aggregates cover every pick day, so any window is a slice of them
+        covered = [agg for agg in view_aggregates.values() if agg is not None]
+        if covered:
+            start_date, end_date = select_date_window(
+                min(agg['start'] for agg in covered),
+                max(last_day(agg) for agg in covered),
+                key="date_range_stream"
+            )
+        
+        view = select_view()
+        agg = view_aggregates[view]
+        if agg is None:
+            st.warning("No data found for the specified customer and hub filters!")
+        else:
+            show_summary_tables(compute_summary_tables(agg, view, start_date, end_date, recorder), view)
+    
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+
+elif uploaded_files or stored_dates or drop_dir:
+    try:
+        row_parts = None
+        if uploaded_files:
+            # Parse the CSV files, reusing cached frames for identical uploads, and fold each new one in
+            live = upload_dataset(uploaded_files, bucket_edges, recorder)
+            row_parts, cube, _ = live.snapshot()
+            merged = live.merged
+            dataset_key = merged.key
+            date_key = f"date_range_{dataset_key}"
+            
+            if len(merged.file_keys) > 1:
+                st.caption(
+                    f"Merged {len(merged.file_keys)} exports: {sum(len(part) for part in row_parts):,} orders, "
+                    f"{merged.duplicates:,} duplicate orders dropped"
+                )
+            raw_nbytes = sum(part.attrs.get('raw_nbytes', 0) for part in merged.parts)
+            st.caption(memory_report(raw_nbytes, *merged.parts, prepared_nbytes=live.nbytes()))
+            cache_stats = get_parsed_upload_cache().stats()
+            st.caption(
+                f"Parse cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+                f"{cache_stats['entries']} files, "
+                f"{cache_stats['size_mb']:.1f} of {cache_stats['max_mb']:.0f} MB"
+            )
+            
+            if save_to_store:
+                saved = sum(ingest_into_store(part, file_key) for file_key, part in zip(merged.file_keys, merged.parts))
+                if saved:
+                    st.success(f"{saved} upload(s) saved to the local store")
+                else:
+                    st.caption("These exports are already in the local store")
+        elif drop_dir:
+            # The watcher prepares each new export and folds it into the running cube on its own thread
+            watcher = folder_watcher(drop_dir)
+            watcher.live.set_edges(bucket_edges)
+            row_parts, cube, live_version = watcher.live.snapshot()
+            dataset_key = f'watch:{drop_dir}:{live_version}'
+            date_key = f"date_range_watch:{drop_dir}"
+            refresh_on_new_exports(watcher.live, live_version)
+            
+            st.caption(
+                f"Watching {drop_dir}: {len(watcher.live.merged.file_keys)} exports, "
+                f"{sum(len(part) for part in row_parts):,} orders, "
+                f"{watcher.live.merged.duplicates:,} duplicate orders dropped"
+            )
+            if watcher.last_error:
+                st.warning(f"Last ingest error: {watcher.last_error}")
+            if cube is None:
+                st.info("Waiting for CSV exports in the drop folder")
+                st.stop()
+        else:
+            # Read only the partitions inside the selected window
+            start_date, end_date = select_date_window(stored_dates[0], stored_dates[-1], key="date_range_store")
+            version = store_version()
+            dataset_key = f'store:{start_date:%Y-%m-%d}:{end_date:%Y-%m-%d}:{version}'
+            with recorder.stage('read_store') as record:
+                df = load_store_window(f'{start_date:%Y-%m-%d}', f'{end_date:%Y-%m-%d}', version)
+                record['rows_out'] = len(df)
+            st.caption(f"Local store: {len(stored_dates)} days of history, {len(df):,} orders in the window")
+            st.caption(memory_report(df.attrs['raw_nbytes'], df))
+        
+        if row_parts is None:
+            # Durations, buckets and the rollup cube are built once per dataset and shared
+            prepared, cube = prepared_dataset(dataset_key, tuple(bucket_edges), df, recorder)
+            row_parts = [prepared]
+        
+        if uploaded_files or drop_dir:
+            if cube.empty:
+                st.warning("No valid 'Picked on' dates found in the exports!")
+                st.stop()
+            start_date, end_date = select_date_window(
+                np.datetime64(int(cube['Picked Day'].iloc[0]), 'D'),
+                np.datetime64(int(cube['Picked Day'].iloc[-1]), 'D'),
+                key=date_key
+            )
+        
+        # Binary-search the sorted cube and rows for the selected window
+        with recorder.stage('window_slice', rows_in=sum(len(part) for part in row_parts)) as record:
+            window_cube = window_slice(cube, 'Picked Day', day_number(start_date), day_number(end_date) + 1)
+            row_slices = [
+                window_slice(part, 'Picked on', start_date.to_datetime64(), (end_date + timedelta(days=1)).to_datetime64())
+                for part in row_parts
+            ]
+            cube_masks = view_masks(window_cube)
+            record['rows_out'] = sum(len(rows) for rows in row_slices)
+        
+        parse_report = date_parse_report(*row_parts)
+        if not parse_report.empty:
+            with st.expander("Date parsing"):
+                st.dataframe(parse_report, use_container_width=True)
+        
+        view = select_view()
+        cube_mask = cube_masks[view]
+        if not cube.attrs['views'][view]:
+            st.warning("No data found for the specified customer and hub filters!")
+        elif not cube_mask.any():
+            st.warning("No data found after date filtering!")
+        else:
+            # Narrow the Store view to a single hub straight from the cube
+            hub = None
+            if view == 'Store' and 'Pickup Hub' in cube.columns:
+                hubs = sorted(window_cube.loc[cube_mask, 'Pickup Hub'].dropna().unique())
+                selected_hub = st.selectbox("Pickup Hub", ['All hubs'] + hubs, key=f"hub_{view}")
+                if selected_hub != 'All hubs':
+                    hub = selected_hub
+                    cube_mask = cube_mask & (window_cube['Pickup Hub'] == hub).to_numpy()
+            section_key = (dataset_key, tuple(bucket_edges), start_date, end_date, view, hub)
+            
+            def compute_view_tables():
+                # The main and shift tables are all answered from the cube
+                with recorder.stage(f'aggregate_cube {view}', rows_in=int(cube_mask.sum())) as record:
+                    agg = aggregate_cube(window_cube, cube_mask)
+                    record['rows_out'] = int(agg['counts'].sum()) if agg is not None else 0
+                return compute_summary_tables(agg, view, start_date, end_date, recorder)
+            
+            show_summary_tables(memoized_section(section_key + ('summary',), compute_view_tables), view)
+            drilldown_section(section_key, window_cube, cube_mask, view)
+            percentiles_section(section_key, row_slices, view, hub, recorder)
+        
+        # The scorecard spans every hub and customer, whichever view is selected
+        st.markdown("---")
+        scorecard_section((dataset_key, tuple(bucket_edges), start_date, end_date), row_slices, recorder)
+    
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+
+elif data_source == "Local store":
+    st.info("The local store is empty. Upload a CSV file and save it to the store first")
+elif data_source == "Watch folder":
+    st.info("Enter a folder to watch for CSV exports")
+else:
+    st.info("Please upload a CSV file to get started")
+
+show_diagnostics(recorder)
@@ -0,0 +1,1487 @@
+"""Delivery analytics pipeline shared by the Streamlit dashboard and the batch report.
+
+Nothing here imports Streamlit, so the functions can run headless.
+"""
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import tracemalloc
+import warnings
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from cachetools import LRUCache
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+# Upper edges (hours) of the delivery time buckets: hourly up to 12 hours, then 12+
+DEFAULT_BUCKET_EDGES = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+
+# Delivery time percentiles reported per day, shift and hub
+PERCENTILES = [0.5, 0.9, 0.99]
+
+# Date formats seen in carrier exports, in order of preference
+DATE_FORMATS = [
+    '%m-%d-%Y %H:%M',  # MM-DD-YYYY HH:MM
+    '%m-%d-%Y',        # MM-DD-YYYY
+    '%d-%m-%Y %H:%M',  # DD-MM-YYYY HH:MM
+    '%d-%m-%Y',        # DD-MM-YYYY
+    '%Y-%m-%d %H:%M',  # YYYY-MM-DD HH:MM
+    '%Y-%m-%d',        # YYYY-MM-DD
+]
+
+# Number of distinct date strings sampled to rank the formats
+DATE_FORMAT_SAMPLE_SIZE = 1000
+
+# Local Parquet store of ingested exports, partitioned by pick date
+STORE_DIR = Path(os.environ.get('DELIVERY_STORE_DIR', 'delivery_store'))
+
+# Folder watched for new exports in watch mode
+DROP_DIR = Path(os.environ.get('DELIVERY_DROP_DIR', 'delivery_drop'))
+
+# A dropped file is ingested once it has not been written to for this many seconds
+DROP_SETTLE_SECONDS = 2.0
+
+# Columns the dashboard uses; the store and streaming ingest read only these
+DASHBOARD_COLUMNS = ['Customer', 'Pickup Hub', 'Picked on', 'Delivered on']
+
+# Default reporting window as month-day, taken in the latest year of the data
+DEFAULT_WINDOW = ('09-20', '10-10')
+
+# Rows per chunk in streaming mode
+STREAM_CHUNK_ROWS = 250_000
+
+# Summary engines: pandas rows and rollup cube, or Arrow compute kernels
+ENGINES = ['pandas', 'arrow']
+
+# Strings the Arrow engine reads as missing, the same set pandas.read_csv uses by default
+ARROW_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# Customer reported on, and the pickup hub of its distribution centre
+TARGET_CUSTOMER = 'WESTSIDE UNIT OF TRENT LIMITED'
+DC_HUB = 'WD27'
+
+# Hub and customer pairs with fewer orders are left out of the scorecard ranking
+SCORECARD_MIN_ORDERS = 100
+
+# Columns derived from the export by the dashboard
+DERIVED_COLUMNS = ['Picked Day', 'Picked Hour', 'delivery_duration_hrs', 'delivery_time_bucket']
+
+# Columns that identify an order, checked in this order
+ORDER_KEY_COLUMNS = ['AWB', 'AWB Number', 'AWB No', 'Order ID', 'Order Number']
+
+# Structured per-stage timing records are logged here when instrumentation is on
+logger = logging.getLogger('delivery_pipeline')
+
+class StageRecorder:
+    """Opt-in per-stage instrumentation: wall time, rows in/out and peak memory above the stage's start.
+    
+    A disabled recorder hands back a scratch record and measures nothing, so
+    wrapping a stage costs one generator call. Stages must not be nested, and
+    peak memory is traced process-wide, so concurrent sessions overlap.
+    """
+    
+    def __init__(self, enabled=False, track_memory=True):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.records = []
+    
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Measure the enclosed block; set record['rows_out'] on the yielded record"""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+        
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.track_memory:
+            tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0] if self.track_memory else 0
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - started, 4)
+            record['peak_mb'] = None
+            if self.track_memory and tracemalloc.is_tracing():
+                peak_bytes = tracemalloc.get_traced_memory()[1] - traced_before
+                record['peak_mb'] = round(peak_bytes / (1024 * 1024), 1)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.records.append(record)
+            logger.info(json.dumps(record))
+    
+    def report(self):
+        """Recorded stages as a DataFrame, in the order they ran"""
+        report = pd.DataFrame(self.records, columns=['stage', 'seconds', 'rows_in', 'rows_out', 'peak_mb'])
+        return report.astype({'rows_in': 'Int64', 'rows_out': 'Int64', 'peak_mb': 'Float64'})
+
+# Shared recorder for callers that do not instrument; it never records anything
+DISABLED_RECORDER = StageRecorder()
+
+def parse_unique_dates(values):
+    """Parse an array of distinct date strings, returning (datetime64 array, format per value).
+    
+    Formats are ranked by how many sampled values they parse. Values the leading
+    format rejects are retried with the next ones, and whatever is still left is
+    parsed one by one ('inferred'). Unparseable values get NaT and format None.
+    """
+    strings = pd.Index(values).astype(str)
+    parsed = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+    formats = np.full(len(strings), None, dtype=object)
+    if len(strings) == 0:
+        return parsed, formats
+    
+    # Rank candidate formats on an evenly spaced sample
+    sample_idx = np.unique(np.linspace(0, len(strings) - 1, min(len(strings), DATE_FORMAT_SAMPLE_SIZE)).astype(int))
+    sample = strings[sample_idx]
+    sample_hits = [
+        pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        for fmt in DATE_FORMATS
+    ]
+    ranked_formats = [DATE_FORMATS[i] for i in sorted(range(len(DATE_FORMATS)), key=lambda i: -sample_hits[i])]
+    
+    remaining = np.arange(len(strings))
+    for fmt in ranked_formats:
+        if len(remaining) == 0:
+            break
+        attempt = pd.to_datetime(strings[remaining], format=fmt, errors='coerce')
+        ok = attempt.notna()
+        parsed[remaining[ok]] = attempt[ok].to_numpy()
+        formats[remaining[ok]] = fmt
+        remaining = remaining[~ok]
+    
+    # Resolve the leftovers individually instead of dropping them
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for i in remaining:
+            value = pd.to_datetime(strings[i], errors='coerce')
+            if not pd.isna(value):
+                parsed[i] = value.to_datetime64()
+                formats[i] = 'inferred'
+    
+    return parsed, formats
+
+def parse_date_column(df, column_name):
+    """Parse date column with multiple possible formats.
+    
+    Each distinct string is parsed once and mapped back to the rows. Per-format
+    hit rates are stored in df.attrs['date_parse_stats'][column_name].
+    """
+    if column_name not in df.columns:
+        return df
+    if pd.api.types.is_datetime64_any_dtype(df[column_name]):
+        return df
+    
+    codes, uniques = pd.factorize(df[column_name])
+    parsed, formats = parse_unique_dates(uniques)
+    
+    # Blank cells keep NaT; a column with no values at all has nothing to look up
+    values = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[ns]')
+    has_value = codes >= 0
+    values[has_value] = parsed[codes[has_value]]
+    df[column_name] = values
+    
+    # Rows handled by each format, out of the non-empty rows
+    rows_per_value = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    stats = {'rows': int(rows_per_value.sum()), 'formats': {}}
+    for fmt in DATE_FORMATS + ['inferred', None]:
+        hits = int(rows_per_value[formats == fmt].sum())
+        if hits:
+            stats['formats'][fmt or 'unparsed'] = hits
+    df.attrs['date_parse_stats'] = {**df.attrs.get('date_parse_stats', {}), column_name: stats}
+    
+    return df
+
+def date_parse_report(*frames):
+    """Per-format hit rates recorded by parse_date_column on the frames, one row per column and format"""
+    rows = []
+    all_stats = merge_date_parse_stats(df.attrs.get('date_parse_stats', {}) for df in frames)
+    for column_name, stats in all_stats.items():
+        for fmt, hits in stats['formats'].items():
+            rows.append({
+                'Column': column_name,
+                'Format': fmt,
+                'Rows': hits,
+                'Hit rate': f"{hits / stats['rows'] * 100:.1f}%",
+            })
+    return pd.DataFrame(rows)
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a DataFrame in bytes"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def optimize_frame(df):
+    """Compact copy of a delivery frame for keeping in memory.
+    
+    Columns the dashboard does not use are dropped (order keys are kept),
+    Customer and Pickup Hub become categories, durations float32, parsed dates
+    stay datetime64, and the pick time is split into 'Picked Day' (int32 days
+    since 1970-01-01) and 'Picked Hour' (int8) so no Python date objects are created.
+    """
+    keep = [
+        column_name for column_name in df.columns
+        if column_name in DASHBOARD_COLUMNS or column_name in DERIVED_COLUMNS or column_name in ORDER_KEY_COLUMNS
+    ]
+    df = df[keep].copy()
+    
+    for column_name in ('Customer', 'Pickup Hub'):
+        if column_name in df.columns:
+            df[column_name] = df[column_name].astype('category')
+    if 'delivery_duration_hrs' in df.columns:
+        df['delivery_duration_hrs'] = df['delivery_duration_hrs'].astype(np.float32)
+    
+    picked = df['Picked on'].to_numpy()
+    has_pick = ~pd.isna(picked)
+    day_values = picked.astype('datetime64[D]')
+    days = np.where(has_pick, day_values.astype(np.int64), 0)
+    hours = np.where(has_pick, (picked - day_values).astype('timedelta64[h]').astype(np.int64), 0)
+    df['Picked Day'] = days.astype(np.int32)
+    df['Picked Hour'] = hours.astype(np.int8)
+    return df
+
+def memory_report(raw_nbytes, *frames, prepared_nbytes=None):
+    """One-line memory readout before and after optimize_frame, for one frame or the parts of a merged dataset.
+    
+    prepared_nbytes, when given, is the size of the prepared rows and cube
+    built from the frames, e.g. LiveDataset.nbytes().
+    """
+    optimized_mb = sum(frame_nbytes(df) for df in frames) / (1024 * 1024)
+    raw_mb = raw_nbytes / (1024 * 1024)
+    report = f"Memory: {raw_mb:.1f} MB as read, {optimized_mb:.1f} MB optimized"
+    if prepared_nbytes is not None:
+        report += f", {prepared_nbytes / (1024 * 1024):.1f} MB prepared"
+    return report + f" ({sum(len(df) for df in frames):,} rows)"
+
+def load_upload(file_bytes, recorder=DISABLED_RECORDER):
+    """Read uploaded CSV bytes, parse the Picked on and Delivered on columns and compact the frame.
+    
+    The size of the frame before optimization is kept in df.attrs['raw_nbytes'].
+    """
+    with recorder.stage('read_csv') as record:
+        df = pd.read_csv(io.BytesIO(file_bytes))
+        raw_nbytes = frame_nbytes(df)
+        record['rows_out'] = len(df)
+    with recorder.stage('parse_date_column', rows_in=len(df)) as record:
+        df = parse_date_column(df, 'Picked on')
+        df = parse_date_column(df, 'Delivered on')
+        record['rows_out'] = int(df['Picked on'].notna().sum()) if 'Picked on' in df.columns else len(df)
+    with recorder.stage('optimize_frame', rows_in=len(df)) as record:
+        df = optimize_frame(df)
+        record['rows_out'] = len(df)
+    df.attrs['raw_nbytes'] = raw_nbytes
+    return df
+
+class ParsedUploadCache:
+    """LRU cache of parsed uploads keyed by a hash of the file bytes and bounded by total memory"""
+    
+    def __init__(self, max_bytes):
+        self._cache = LRUCache(maxsize=max_bytes, getsizeof=frame_nbytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_parse(self, file_bytes, key=None, recorder=DISABLED_RECORDER):
+        """Return the parsed frame for these bytes, parsing only on a miss.
+        
+        key defaults to content_hash(file_bytes). The returned frame is shared
+        between sessions and must not be modified in place.
+        """
+        key = key or content_hash(file_bytes)
+        with self._lock:
+            df = self._cache.get(key)
+            if df is not None:
+                self.hits += 1
+                return df
+            self.misses += 1
+        
+        # Parse outside the lock so other sessions are not blocked
+        df = load_upload(file_bytes, recorder)
+        with self._lock:
+            try:
+                self._cache[key] = df
+            except ValueError:
+                # Larger than the whole cache, serve it without caching
+                pass
+        return df
+    
+    def stats(self):
+        """Hit/miss counters and current size of the cache"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._cache),
+                'size_mb': self._cache.currsize / (1024 * 1024),
+                'max_mb': self._cache.maxsize / (1024 * 1024),
+            }
+
+class MergedUploads:
+    """Running union of parsed exports, de-duplicated on the order key.
+    
+    Each added export becomes a new part, and the latest copy of an order wins,
+    as in the store: an export keeps the last of its own repeats, and rows of
+    earlier parts it carries again are taken out of those parts, e.g. an order
+    exported again once delivered. Adding an export costs time in its own rows
+    and the rows it replaces. Rows without an order key are never dropped.
+    """
+    
+    def __init__(self):
+        self.file_keys = []
+        self.parts = []
+        self.duplicates = 0
+        # Order key -> part number << 32 | index label of the row holding it
+        self._owners = {}
+    
+    def add(self, df, file_key):
+        """Merge one parsed export with integer index labels, as load_upload gives.
+        
+        Returns {part number: index labels} of the rows dropped as older copies,
+        the new part's own repeats included, or None when the export was merged before.
+        """
+        if file_key in self.file_keys:
+            return None
+        
+        part_number = len(self.parts)
+        dropped = {}
+        keys = order_keys(df)
+        if keys is not None:
+            has_key = keys.notna().to_numpy()
+            repeats = keys.duplicated(keep='last').to_numpy() & has_key
+            kept = has_key & ~repeats
+            key_values = keys.to_numpy(dtype=object)[kept]
+            owners = np.fromiter(
+                map(self._owners.get, key_values, itertools.repeat(-1)), dtype=np.int64, count=len(key_values)
+            )
+            self._owners.update(zip(key_values, (part_number << 32 | df.index.to_numpy()[kept]).tolist()))
+            
+            # Take the older copies out of the parts holding them
+            owners = owners[owners >= 0]
+            for owner_part in np.unique(owners >> 32):
+                labels = owners[owners >> 32 == owner_part] & 0xFFFFFFFF
+                self.parts[owner_part] = self.parts[owner_part].drop(index=labels)
+                dropped[int(owner_part)] = labels
+            if repeats.any():
+                dropped[part_number] = df.index.to_numpy()[repeats]
+                df = df[~repeats]
+            self.duplicates += int(repeats.sum()) + len(owners)
+        
+        self.file_keys.append(file_key)
+        self.parts.append(df)
+        return dropped
+    
+    def copy(self):
+        """Independent MergedUploads holding the same exports; the frames are shared, not copied"""
+        merged = MergedUploads()
+        merged.file_keys = list(self.file_keys)
+        merged.parts = list(self.parts)
+        merged.duplicates = self.duplicates
+        merged._owners = dict(self._owners)
+        return merged
+    
+    @property
+    def key(self):
+        """Identifies the merged dataset; a single export keeps its own content hash"""
+        if len(self.file_keys) == 1:
+            return self.file_keys[0]
+        return content_hash('\n'.join(self.file_keys).encode())
+
+def merge_date_parse_stats(stats_list):
+    """Add up date_parse_stats recorded on several frames"""
+    merged = {}
+    for stats in stats_list:
+        for column_name, column_stats in stats.items():
+            target = merged.setdefault(column_name, {'rows': 0, 'formats': {}})
+            target['rows'] += column_stats['rows']
+            for fmt, hits in column_stats['formats'].items():
+                target['formats'][fmt] = target['formats'].get(fmt, 0) + hits
+    return merged
+
+def content_hash(file_bytes):
+    """Hex digest identifying an export by its bytes"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def order_key_columns(df):
+    """Columns identifying an order: the first known order key present, or None without one"""
+    for column_name in ORDER_KEY_COLUMNS:
+        if column_name in df.columns:
+            return [column_name]
+    return None
+
+def order_keys(df):
+    """Order keys of df as text that matches across exports, or None without an order key column.
+    
+    Whole-number keys read as float because of blank cells are written without
+    a trailing '.0', so they match the same keys read as integers elsewhere.
+    Missing keys stay missing.
+    """
+    key_columns = order_key_columns(df)
+    if key_columns is None:
+        return None
+    keys = df[key_columns[0]]
+    if pd.api.types.is_float_dtype(keys) and (keys.dropna() % 1 == 0).all():
+        keys = keys.astype('Int64')
+    return keys.astype('string')
+
+def normalize_export(df):
+    """Typed copy of a parsed export ready for the store.
+    
+    Timestamps are parsed and every other column is stored as text so that
+    partitions written from different exports share one schema. Rows without
+    a pick time can never fall into a reporting window and are dropped.
+    """
+    df = df[df['Picked on'].notna()].drop(columns=[name for name in DERIVED_COLUMNS if name in df.columns])
+    df = parse_date_column(df, 'Delivered on')
+    key_columns = order_key_columns(df)
+    if key_columns is not None:
+        df[key_columns[0]] = order_keys(df)
+    for column_name in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df[column_name]):
+            df[column_name] = df[column_name].astype('string')
+    df['pick_date'] = df['Picked on'].dt.strftime('%Y-%m-%d')
+    return df
+
+# Serializes writers to the store, e.g. the folder watcher and a dashboard upload
+_store_lock = threading.Lock()
+
+def read_order_index():
+    """Pick date of every order key in the store, as a Series indexed by key.
+    
+    Stores written before the index was kept have it rebuilt from their partitions.
+    """
+    index_path = STORE_DIR / '_order_index.parquet'
+    if index_path.exists():
+        index = pd.read_parquet(index_path)
+    else:
+        frames = []
+        for part_path in STORE_DIR.glob('pick_date=*/part-0.parquet'):
+            names = pq.read_schema(part_path).names
+            key_column = next((column_name for column_name in ORDER_KEY_COLUMNS if column_name in names), None)
+            if key_column is None:
+                continue
+            keys = pd.read_parquet(part_path, columns=[key_column])[key_column].dropna()
+            frames.append(pd.DataFrame({'key': keys.to_numpy(), 'pick_date': part_path.parent.name.split('=', 1)[1]}))
+        index = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'key': [], 'pick_date': []})
+    index = index.drop_duplicates('key', keep='last')
+    return pd.Series(index['pick_date'].to_numpy(dtype=object), index=index['key'].to_numpy(dtype=object))
+
+def ingest_into_store(df, file_hash):
+    """Write a parsed export into the Parquet store, one partition per pick date.
+    
+    Returns False when an export with the same bytes was already ingested.
+    The last copy of an order replaces earlier ones, as in MergedUploads: an
+    order whose pick date changed is taken out of its old partition, found
+    through the key -> pick date index kept in _order_index.parquet. Rows
+    without an order key are all kept, and exports without an order key column
+    are only de-duplicated by file.
+    """
+    with _store_lock:
+        manifest_path = STORE_DIR / '_ingested.txt'
+        if manifest_path.exists() and file_hash in manifest_path.read_text().split():
+            return False
+        
+        STORE_DIR.mkdir(parents=True, exist_ok=True)
+        # Temp files of a write that never finished; the partition files themselves are intact
+        for stale_path in itertools.chain(STORE_DIR.glob('*.tmp'), STORE_DIR.glob('pick_date=*/*.tmp')):
+            stale_path.unlink(missing_ok=True)
+        normalized = normalize_export(df)
+        
+        # Keys stored under another pick date than their latest copy, per partition to take them out of
+        moved_out = {}
+        order_index = None
+        key_columns = order_key_columns(normalized)
+        if key_columns is not None:
+            keys = normalized[key_columns[0]]
+            normalized = normalized[~(keys.duplicated(keep='last') & keys.notna()).to_numpy()]
+            latest = normalized.loc[normalized[key_columns[0]].notna(), [key_columns[0], 'pick_date']]
+            latest_keys = latest[key_columns[0]].to_numpy(dtype=object)
+            latest_dates = latest['pick_date'].to_numpy(dtype=object)
+            order_index = read_order_index()
+            stored_dates = order_index.reindex(latest_keys).to_numpy(dtype=object)
+            moved = pd.notna(stored_dates) & (stored_dates != latest_dates)
+            for stored_date, key in zip(stored_dates[moved], latest_keys[moved]):
+                moved_out.setdefault(stored_date, []).append(key)
+            order_index = pd.concat([order_index, pd.Series(latest_dates, index=latest_keys)])
+        
+        parts = dict(tuple(normalized.groupby('pick_date')))
+        for pick_date in sorted(set(parts) | set(moved_out)):
+            partition_dir = STORE_DIR / f'pick_date={pick_date}'
+            partition_dir.mkdir(exist_ok=True)
+            part_path = partition_dir / 'part-0.parquet'
+            frames = []
+            if part_path.exists():
+                stored = pd.read_parquet(part_path)
+                stored_keys = order_key_columns(stored)
+                if pick_date in moved_out and stored_keys is not None:
+                    stored = stored[~stored[stored_keys[0]].isin(moved_out[pick_date]).to_numpy()]
+                frames.append(stored)
+            if pick_date in parts:
+                frames.append(parts[pick_date].drop(columns='pick_date'))
+            part = pd.concat(frames, ignore_index=True)
+            part_keys = order_key_columns(part)
+            if part_keys is not None:
+                repeated = part.duplicated(subset=part_keys, keep='last') & part[part_keys[0]].notna()
+                part = part[~repeated.to_numpy()]
+            if part.empty:
+                # Every order of the partition moved to another pick date
+                part_path.unlink(missing_ok=True)
+                continue
+            
+            # Write next to the partition and swap it in so readers never see a partial file;
+            # dataset discovery skips names starting with '_', so readers never see the temp file either
+            tmp_path = partition_dir / '_part-0.parquet.tmp'
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, part_path)
+        
+        if order_index is not None:
+            order_index = order_index[~order_index.index.duplicated(keep='last')]
+            index_path = STORE_DIR / '_order_index.parquet'
+            tmp_path = STORE_DIR / '_order_index.parquet.tmp'
+            pd.DataFrame({'key': order_index.index, 'pick_date': order_index.to_numpy()}).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, index_path)
+        
+        with open(manifest_path, 'a') as manifest:
+            manifest.write(file_hash + '\n')
+        return True
+
+def store_pick_dates():
+    """Pick dates with a partition in the store, oldest first"""
+    if not STORE_DIR.exists():
+        return []
+    return sorted(
+        path.name.split('=', 1)[1]
+        for path in STORE_DIR.glob('pick_date=*')
+        if (path / 'part-0.parquet').exists()
+    )
+
+def store_version():
+    """Token that changes whenever the store is written to"""
+    manifest_path = STORE_DIR / '_ingested.txt'
+    return manifest_path.stat().st_mtime_ns if manifest_path.exists() else 0
+
+def read_store(start_date, end_date):
+    """Orders picked between start_date and end_date (inclusive, 'YYYY-MM-DD').
+    
+    Only the columns the dashboard uses and the partitions inside the window are read.
+    """
+    dataset = ds.dataset(
+        STORE_DIR,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('pick_date', pa.string())]), flavor='hive'),
+    )
+    columns = [name for name in DASHBOARD_COLUMNS if name in dataset.schema.names]
+    window = (ds.field('pick_date') >= start_date) & (ds.field('pick_date') <= end_date)
+    df = dataset.to_table(columns=columns, filter=window).to_pandas()
+    raw_nbytes = frame_nbytes(df)
+    df = optimize_frame(df)
+    df.attrs['raw_nbytes'] = raw_nbytes
+    return df
+
+def bucket_labels(edges):
+    """Display labels for bucket edges, e.g. [1, 2] -> ['0-1Hrs', '1-2Hrs', '2+Hrs']"""
+    lower = [0] + list(edges)
+    labels = [f"{lo:g}-{hi:g}Hrs" for lo, hi in zip(lower, edges)]
+    labels.append(f"{edges[-1]:g}+Hrs")
+    return labels
+
+def parse_bucket_edges(text):
+    """Parse comma-separated bucket edges in hours; raises ValueError on bad input"""
+    edges = sorted({float(part) for part in text.replace(' ', '').split(',') if part})
+    if not edges or edges[0] <= 0:
+        raise ValueError("Bucket edges must be positive numbers of hours")
+    return edges
+
+def assign_buckets(durations, edges):
+    """Integer bucket codes for durations in hours: a duration d falls in bucket i
+    when edges[i-1] < d <= edges[i], durations above the last edge get len(edges),
+    and missing durations get -1.
+    """
+    durations = np.asarray(durations, dtype=float)
+    codes = np.searchsorted(np.asarray(edges, dtype=float), durations, side='left').astype(np.int16)
+    codes[np.isnan(durations)] = -1
+    return codes
+
+def calculate_time_durations(df, edges=DEFAULT_BUCKET_EDGES):
+    """Calculate time durations from Picked on to Delivered on.
+    
+    delivery_time_bucket is a categorical holding the bucket of each order for
+    the given edges; orders without a duration are left out (NaN).
+    """
+    # Parse Delivered on column
+    df = parse_date_column(df, 'Delivered on')
+    
+    # Calculate time difference in hours
+    mask = (~df['Picked on'].isna()) & (~df['Delivered on'].isna())
+    df.loc[mask, 'delivery_duration_hrs'] = (
+        df.loc[mask, 'Delivered on'] - df.loc[mask, 'Picked on']
+    ).dt.total_seconds() / 3600
+    
+    # Categorize into time buckets in a single pass over the durations, then store them as float32
+    df['delivery_time_bucket'] = pd.Categorical.from_codes(
+        assign_buckets(df['delivery_duration_hrs'], edges), categories=bucket_labels(edges)
+    )
+    df['delivery_duration_hrs'] = df['delivery_duration_hrs'].astype(np.float32)
+    
+    return df
+
+def delivery_percentiles(df, mask, group_by):
+    """p50/p90/p99 delivery hours for the masked rows grouped by 'Day', 'Shift' or 'Hub'.
+    
+    'Day' is the pick date as datetime64, so days of different years stay
+    apart and sort in time; format it for display at render time.
+    """
+    rows = df[mask]
+    picked = rows['Picked on']
+    if group_by == 'Day':
+        keys = pd.Series(picked.to_numpy().astype('datetime64[D]'), index=rows.index, name='Day')
+    elif group_by == 'Shift':
+        keys = pd.Series(np.where(picked.dt.hour < 12, 'Morning', 'Afternoon'), index=rows.index, name='Shift')
+    else:
+        keys = rows['Pickup Hub'].rename('Hub')
+    
+    grouped = rows['delivery_duration_hrs'].groupby(keys, observed=True)
+    percentiles = grouped.quantile(PERCENTILES).unstack()
+    percentiles.columns = [f"p{int(q * 100)}" for q in PERCENTILES]
+    percentiles.insert(0, 'Orders', grouped.count())
+    return percentiles.round(1).reset_index()
+
+def hub_scorecard(df, mask=None):
+    """Scorecard of every pickup hub and customer in one grouped pass over the rows.
+    
+    Each (Pickup Hub, Customer) pair gets its order count, morning and afternoon
+    shares, the share of its orders in each delivery time bucket, and average,
+    p90 and p99 delivery hours. Counts come from np.bincount over integer group
+    codes and the percentiles from one sort of the durations, so the cost does
+    not grow with the number of hubs. Percentiles interpolate linearly, as
+    pandas quantile does. Every pair is returned, ranked by p90 hours; use
+    rank_scorecard to rank only pairs with enough orders.
+    """
+    selected = df['Picked on'].notna().to_numpy()
+    if mask is not None:
+        selected &= np.asarray(mask)
+    rows = np.flatnonzero(selected)
+    dimensions = [column_name for column_name in ('Pickup Hub', 'Customer') if column_name in df.columns]
+    if len(rows) == 0 or not dimensions:
+        return pd.DataFrame()
+    
+    # One integer code per (hub, customer) pair present, numbered densely without sorting the rows
+    combined = np.zeros(len(rows), dtype=np.int64)
+    levels = []
+    for column_name in dimensions:
+        codes, uniques = pd.factorize(df[column_name].take(rows), use_na_sentinel=False)
+        combined = combined * len(uniques) + codes
+        levels.append(np.asarray(uniques, dtype=object))
+    present = np.bincount(combined) > 0
+    group_ids = np.flatnonzero(present)
+    groups = (np.cumsum(present) - 1)[combined]
+    n_groups = len(group_ids)
+    
+    orders = np.bincount(groups, minlength=n_groups)
+    picked = df['Picked on'].to_numpy()[rows]
+    is_morning = picked - picked.astype('datetime64[D]') < np.timedelta64(12, 'h')
+    morning = np.bincount(groups, weights=is_morning, minlength=n_groups)
+    
+    buckets = df['delivery_time_bucket']
+    labels = list(buckets.cat.categories)
+    bucket_codes = buckets.cat.codes.to_numpy()[rows].astype(np.int64)
+    has_bucket = bucket_codes >= 0
+    bucket_counts = np.bincount(
+        groups[has_bucket] * len(labels) + bucket_codes[has_bucket], minlength=n_groups * len(labels)
+    ).reshape(n_groups, len(labels))
+    
+    # Measured durations sorted by group, then by value, for the averages and percentiles
+    durations = df['delivery_duration_hrs'].to_numpy(dtype=np.float64)[rows]
+    has_duration = ~np.isnan(durations)
+    measured_groups = groups[has_duration]
+    measured = durations[has_duration]
+    # A stable sort of 16-bit codes is a radix sort: order by value, then stably by group
+    by_value = np.argsort(measured)
+    group_codes = measured_groups.astype(np.int16 if n_groups <= np.iinfo(np.int16).max else np.int64)
+    measured = measured[by_value][np.argsort(group_codes[by_value], kind='stable')]
+    counts = np.bincount(measured_groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    last = starts + np.maximum(counts - 1, 0)
+    has_measured = counts > 0
+    
+    # Split the group ids back into one code per dimension
+    scorecard = {}
+    remaining = group_ids
+    for column_name, uniques in reversed(list(zip(dimensions, levels))):
+        remaining, codes = np.divmod(remaining, len(uniques))
+        scorecard[column_name] = uniques[codes]
+    scorecard = {column_name: scorecard[column_name] for column_name in dimensions}
+    scorecard['Orders'] = orders
+    scorecard['Morning %'] = morning / orders * 100
+    scorecard['Afternoon %'] = (orders - morning) / orders * 100
+    for i, label in enumerate(labels):
+        scorecard[f'{label} %'] = bucket_counts[:, i] / orders * 100
+    
+    duration_sum = np.bincount(measured_groups, weights=durations[has_duration], minlength=n_groups)
+    scorecard['Avg Hrs'] = np.divide(duration_sum, counts, out=np.full(n_groups, np.nan), where=has_measured)
+    for q in (0.9, 0.99):
+        position = starts + q * (last - starts)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        values = np.full(n_groups, np.nan)
+        values[has_measured] = (
+            measured[lower[has_measured]]
+            + (measured[upper[has_measured]] - measured[lower[has_measured]]) * (position - lower)[has_measured]
+        )
+        scorecard[f'p{int(q * 100)} Hrs'] = values
+    
+    return rank_scorecard(pd.DataFrame(scorecard), min_orders=0)
+
+def rank_scorecard(scorecard, by='p90 Hrs', min_orders=SCORECARD_MIN_ORDERS):
+    """hub_scorecard rows with at least min_orders orders, ordered by the by column, largest first.
+    
+    A Rank column numbers them. Pairs with fewer orders are left out, so a
+    handful of late orders cannot put a small pair above the slow stores.
+    """
+    ranked = scorecard[scorecard['Orders'] >= min_orders].drop(columns='Rank', errors='ignore').sort_values(
+        by, ascending=False, kind='stable', na_position='last', ignore_index=True
+    )
+    ranked.insert(0, 'Rank', np.arange(1, len(ranked) + 1))
+    return ranked
+
+def default_window(latest_day):
+    """Reporting window preselected for a dataset whose latest pick is latest_day"""
+    current_year = pd.Timestamp(latest_day).year
+    return (
+        pd.Timestamp(f'{current_year}-{DEFAULT_WINDOW[0]}'),
+        pd.Timestamp(f'{current_year}-{DEFAULT_WINDOW[1]}'),
+    )
+
+def window_slice(df, column_name, lower, upper):
+    """Rows of df, sorted on column_name, with lower <= value < upper.
+    
+    The bounds are found by binary search, so the cost is O(log n) plus the size of the slice.
+    """
+    lo, hi = np.searchsorted(df[column_name].to_numpy(), [lower, upper], side='left')
+    return df.iloc[lo:hi]
+
+def aggregate_codes(day_codes, hours, bucket_codes, labels, orders=None, duration_sum=None, duration_count=None):
+    """Bin integer day, hour and bucket codes into the dense arrays of aggregate_orders.
+    
+    orders, duration_sum and duration_count are optional per-row weights, so both
+    raw rows (one order each) and rollup cube cells can be aggregated.
+    """
+    if len(day_codes) == 0:
+        return None
+    
+    # Day codes relative to the first day, and shift codes (0 morning, 1 afternoon)
+    first_day = day_codes.min()
+    day_codes = day_codes - first_day
+    n_days = int(day_codes.max()) + 1
+    shift_codes = (hours >= 12).astype(np.int64)
+    
+    # Missing buckets are counted as Unknown in the last slot
+    n_buckets = len(labels) + 1
+    bucket_codes = np.where(bucket_codes < 0, n_buckets - 1, bucket_codes)
+    
+    cells = day_codes * 2 + shift_codes
+    counts = np.bincount(
+        cells * n_buckets + bucket_codes, weights=orders, minlength=n_days * 2 * n_buckets
+    ).astype(np.int64).reshape(n_days, 2, n_buckets)
+    duration_sum = np.bincount(
+        cells, weights=duration_sum, minlength=n_days * 2
+    ).reshape(n_days, 2)
+    duration_count = np.bincount(
+        cells, weights=duration_count, minlength=n_days * 2
+    ).astype(np.int64).reshape(n_days, 2)
+    
+    return {
+        'start': pd.Timestamp(np.datetime64(int(first_day), 'D')),
+        'labels': labels,
+        'counts': counts,
+        'duration_sum': duration_sum,
+        'duration_count': duration_count,
+    }
+
+def aggregate_orders(df, mask=None):
+    """Count orders per day x shift x bucket in a single vectorized pass.
+    
+    An optional boolean row mask restricts the count without copying the frame.
+    Returns None when no selected row has a pick time, otherwise a dict of dense arrays
+    covering every day from the first to the last pick date:
+    'start' is the first day, 'labels' the bucket labels, 'counts' has shape (days, 2 shifts, buckets + Unknown),
+    'duration_sum' and 'duration_count' have shape (days, 2 shifts).
+    """
+    picked = df['Picked on'].to_numpy()
+    valid = ~pd.isna(picked)
+    if mask is not None:
+        valid &= mask
+    if not valid.any():
+        return None
+    picked = picked[valid]
+    
+    if 'Picked Day' in df.columns:
+        day_codes = df['Picked Day'].to_numpy()[valid].astype(np.int64)
+        hours = df['Picked Hour'].to_numpy()[valid]
+    else:
+        day_values = picked.astype('datetime64[D]')
+        day_codes = day_values.astype(np.int64)
+        hours = (picked - day_values).astype('timedelta64[h]').astype(np.int64)
+    
+    buckets = df['delivery_time_bucket']
+    bucket_codes = buckets.cat.codes.to_numpy()[valid].astype(np.int64)
+    
+    durations = df['delivery_duration_hrs'].to_numpy(dtype=np.float64)[valid]
+    has_duration = ~np.isnan(durations)
+    return aggregate_codes(
+        day_codes, hours, bucket_codes, list(buckets.cat.categories),
+        duration_sum=np.where(has_duration, durations, 0.0),
+        duration_count=has_duration.astype(np.float64),
+    )
+
+def build_rollup_cube(df):
+    """Roll orders up to pick day x pick hour x pickup hub x customer x bucket.
+    
+    Returns one row per combination present, with the integer dimensions
+    'Picked Day' (days since 1970-01-01), 'Picked Hour' and 'bucket' (code into
+    cube.attrs['labels'], -1 for Unknown), plus 'orders', 'duration_sum' and
+    'duration_count'. Orders without a pick time are left out.
+    """
+    has_pick = df['Picked on'].notna().to_numpy()
+    dimensions = ['Picked Day', 'Picked Hour'] + [
+        column_name for column_name in ('Pickup Hub', 'Customer') if column_name in df.columns
+    ]
+    frame = df.loc[has_pick, dimensions]
+    frame['bucket'] = df['delivery_time_bucket'].cat.codes.to_numpy()[has_pick]
+    frame['duration'] = df['delivery_duration_hrs'].to_numpy(dtype=np.float64)[has_pick]
+    
+    cube = (
+        frame.groupby(dimensions + ['bucket'], observed=True, dropna=False, sort=False)['duration']
+        .agg(['size', 'sum', 'count'])
+        .rename(columns={'size': 'orders', 'sum': 'duration_sum', 'count': 'duration_count'})
+        .reset_index()
+    )
+    cube.attrs['labels'] = list(df['delivery_time_bucket'].cat.categories)
+    return cube
+
+def aggregate_cube(cube, mask):
+    """aggregate_orders equivalent answered from the rollup cube cells selected by mask"""
+    if not mask.any():
+        return None
+    return aggregate_codes(
+        cube['Picked Day'].to_numpy()[mask].astype(np.int64),
+        cube['Picked Hour'].to_numpy()[mask],
+        cube['bucket'].to_numpy()[mask].astype(np.int64),
+        cube.attrs['labels'],
+        orders=cube['orders'].to_numpy(dtype=np.float64)[mask],
+        duration_sum=cube['duration_sum'].to_numpy()[mask],
+        duration_count=cube['duration_count'].to_numpy(dtype=np.float64)[mask],
+    )
+
+def combine_cubes(*cubes):
+    """Add the cells of rollup cubes with the same labels, sorted on 'Picked Day'.
+    
+    None stands for no cube. The cost depends on the number of cells, not on
+    the orders behind them. Cells left without orders, when a cube holds the
+    negated cells of orders taken out, are dropped.
+    """
+    cubes = [cube for cube in cubes if cube is not None]
+    if len(cubes) <= 1:
+        return cubes[0] if cubes else None
+    
+    measures = ['orders', 'duration_sum', 'duration_count']
+    dimensions = [column_name for column_name in cubes[0].columns if column_name not in measures]
+    cube = (
+        pd.concat(cubes, ignore_index=True)
+        .groupby(dimensions, observed=True, dropna=False, sort=False)[measures].sum()
+        .reset_index()
+    )
+    cube = cube[cube['orders'] != 0].sort_values('Picked Day', kind='stable', ignore_index=True)
+    cube.attrs['labels'] = cubes[0].attrs['labels']
+    cube.attrs['views'] = {view: bool(mask.any()) for view, mask in view_masks(cube).items()}
+    return cube
+
+def cube_breakdown(cube, mask, by):
+    """Orders, bucket counts and average hours per value of a cube dimension, e.g. 'Pickup Hub' or 'Picked Hour'"""
+    cells = cube[mask]
+    labels = cube.attrs['labels']
+    
+    bucket_counts = (
+        cells.groupby([by, 'bucket'], observed=True)['orders'].sum()
+        .unstack(fill_value=0)
+        .reindex(columns=range(len(labels)), fill_value=0)
+    )
+    bucket_counts.columns = labels
+    
+    totals = cells.groupby(by, observed=True)[['orders', 'duration_sum', 'duration_count']].sum()
+    breakdown = pd.DataFrame({'Total': totals['orders']}).join(bucket_counts)
+    breakdown['Avg Hrs'] = (totals['duration_sum'] / totals['duration_count']).round(1).fillna(0)
+    return breakdown[breakdown['Total'] > 0].reset_index()
+
+def build_summary(agg, tab_name, start_date, end_date, shift_type=None):
+    """Per-day rows and the TOTAL row of one table for a date window, as typed DataFrames.
+    
+    rows holds the pick date (datetime64) under tab_name, integer order and
+    bucket counts, shift percentages as whole numbers and 'Avg Hrs' as a float;
+    total is a one-row frame labelled 'TOTAL'. With shift_type 'Morning' or
+    'Afternoon' only that shift is counted and the shift split columns are left
+    out. Days without orders are skipped, and (None, None) is returned when the
+    window has no orders at all.
+    """
+    if agg is None:
+        return None, None
+    
+    if shift_type is None:
+        shifts = [0, 1]
+    else:
+        shifts = [0] if shift_type == 'Morning' else [1]
+    counts = agg['counts'][:, shifts, :]
+    duration_sum = agg['duration_sum'][:, shifts].sum(axis=1)
+    duration_count = agg['duration_count'][:, shifts].sum(axis=1)
+    
+    # Slice the window out of the dense day axis
+    n_days = counts.shape[0]
+    lo = min(max((start_date - agg['start']).days, 0), n_days)
+    hi = min(max((end_date - agg['start']).days + 1, lo), n_days)
+    
+    day_shift_counts = counts[lo:hi].sum(axis=2)
+    day_totals = day_shift_counts.sum(axis=1)
+    day_buckets = counts[lo:hi].sum(axis=1)
+    window_sum = duration_sum[lo:hi]
+    window_count = duration_count[lo:hi]
+    
+    days = np.flatnonzero(day_totals)
+    if len(days) == 0:
+        return None, None
+    
+    rows = {
+        tab_name: agg['start'] + pd.to_timedelta(lo + days, unit='D'),
+        'Total': day_totals[days],
+    }
+    total = {tab_name: 'TOTAL', 'Total': day_totals.sum()}
+    if shift_type is None:
+        rows['Morning shift'] = day_shift_counts[days, 0]
+        rows['Afternoon Slot'] = day_shift_counts[days, 1]
+        rows['Morning %'] = np.round(rows['Morning shift'] / rows['Total'] * 100).astype(np.int64)
+        rows['Afternoon %'] = np.round(rows['Afternoon Slot'] / rows['Total'] * 100).astype(np.int64)
+        total['Morning shift'], total['Afternoon Slot'] = day_shift_counts.sum(axis=0)
+        total['Morning %'] = int(np.round(total['Morning shift'] / total['Total'] * 100))
+        total['Afternoon %'] = int(np.round(total['Afternoon Slot'] / total['Total'] * 100))
+    for i, label in enumerate(agg['labels']):
+        rows[label] = day_buckets[days, i]
+        total[label] = day_buckets[:, i].sum()
+    
+    # Days without a measured duration show 0 hours, as does a window without any
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rows['Avg Hrs'] = np.where(window_count[days] > 0, np.round(window_sum[days] / window_count[days], 1), 0.0)
+    overall_count = window_count.sum()
+    total['Avg Hrs'] = round(window_sum.sum() / overall_count, 1) if overall_count > 0 else 0.0
+    
+    return pd.DataFrame(rows), pd.DataFrame([total])
+
+def merge_aggregates(left, right):
+    """Sum two aggregate_orders results, aligning their day axes"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    
+    start = min(left['start'], right['start'])
+    n_days = max(
+        (agg['start'] - start).days + len(agg['counts']) for agg in (left, right)
+    )
+    merged = {'start': start, 'labels': left['labels']}
+    for key in ('counts', 'duration_sum', 'duration_count'):
+        values = np.zeros((n_days,) + left[key].shape[1:], dtype=np.result_type(left[key], right[key]))
+        for agg in (left, right):
+            offset = (agg['start'] - start).days
+            values[offset:offset + len(agg[key])] += agg[key]
+        merged[key] = values
+    return merged
+
+def stream_summaries(file, edges=DEFAULT_BUCKET_EDGES, chunksize=STREAM_CHUNK_ROWS):
+    """Aggregate an export chunk by chunk for the DC and Store views.
+    
+    Only DASHBOARD_COLUMNS are read, and the customer and hub predicates are
+    applied to each chunk before it is folded into running aggregates, so peak
+    memory depends on the chunk size rather than the file size. Returns
+    {view: aggregate} over every pick day, which any date window can be sliced from.
+    """
+    running = {'DC': None, 'Store': None}
+    
+    reader = pd.read_csv(file, usecols=lambda name: name in DASHBOARD_COLUMNS, chunksize=chunksize)
+    for chunk in reader:
+        if 'Customer' in chunk.columns:
+            chunk = chunk[chunk['Customer'] == TARGET_CUSTOMER]
+        chunk = parse_date_column(chunk, 'Picked on')
+        chunk = chunk[chunk['Picked on'].notna()]
+        
+        for view, view_mask in view_masks(chunk).items():
+            if view_mask.any():
+                agg = aggregate_orders(calculate_time_durations(chunk[view_mask].copy(), edges))
+                running[view] = merge_aggregates(running[view], agg)
+    
+    return running
+
+def arrow_parse_dates(column):
+    """Parse an Arrow string column into timestamps the way parse_date_column does.
+    
+    Each distinct string is parsed once with parse_unique_dates, so mixed
+    formats resolve exactly as in the pandas engine, and the result is taken
+    back to the rows with Arrow kernels.
+    """
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    parsed, _ = parse_unique_dates(encoded.dictionary.to_numpy(zero_copy_only=False))
+    return pc.take(pa.array(parsed, type=pa.timestamp('ns'), from_pandas=True), encoded.indices)
+
+def arrow_order_keys(column):
+    """Order keys of an Arrow string column, written the way order_keys writes them for pandas.
+    
+    pandas reads an all-numeric key column as numbers, so '0012' and '12.0'
+    both become '12' there; the same keys are cast through int64 here.
+    """
+    for numeric_type in (pa.int64(), pa.float64()):
+        try:
+            numbers = pc.cast(column, numeric_type)
+        except pa.ArrowInvalid:
+            continue
+        if numeric_type == pa.float64() and not pc.all(pc.equal(numbers, pc.floor(numbers))).as_py():
+            return column
+        return pc.cast(pc.cast(numbers, pa.int64()), pa.string())
+    return column
+
+def read_arrow_export(file_bytes):
+    """The dashboard columns of one export as an Arrow table, read with Arrow's multithreaded CSV reader.
+    
+    'Picked on' and 'Delivered on' are parsed into timestamps per export, as
+    load_upload parses them, and every other column stays text. The export's
+    order key, if it has one, is added as 'Order key', written the way
+    order_keys writes it, so keys match across exports.
+    """
+    names = pacsv.open_csv(io.BytesIO(file_bytes)).schema.names
+    key_column = next((column_name for column_name in ORDER_KEY_COLUMNS if column_name in names), None)
+    columns = [column_name for column_name in DASHBOARD_COLUMNS if column_name in names]
+    read_columns = columns + ([key_column] if key_column is not None else [])
+    table = pacsv.read_csv(
+        io.BytesIO(file_bytes),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=read_columns,
+            column_types={column_name: pa.string() for column_name in read_columns},
+            null_values=ARROW_NULL_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    for column_name in ('Picked on', 'Delivered on'):
+        table = table.set_column(
+            table.column_names.index(column_name), column_name, arrow_parse_dates(table[column_name])
+        )
+    if key_column is None:
+        return table
+    keys = arrow_order_keys(table[key_column].combine_chunks())
+    return table.select(columns).append_column('Order key', keys)
+
+def arrow_summaries(file_bytes, edges=DEFAULT_BUCKET_EDGES):
+    """Aggregates for the DC and Store views of one export computed with Arrow; see arrow_table_summaries"""
+    return arrow_table_summaries([read_arrow_export(file_bytes)], edges)
+
+def arrow_table_summaries(tables, edges=DEFAULT_BUCKET_EDGES):
+    """Aggregates for the DC and Store views computed with Arrow, in the form stream_summaries returns.
+    
+    tables are exports read with read_arrow_export, in upload order. They are
+    merged as MergedUploads merges them: an order repeated within or across
+    exports is counted once, from its last row. The customer and hub filters,
+    durations, buckets and day x shift x bucket grouping run as Arrow compute
+    kernels, which use every core. Returns {view: aggregate} over every pick
+    day, with the same numbers as the pandas engine.
+    """
+    edges = list(edges)
+    table = pa.concat_tables(tables, promote_options='default') if len(tables) > 1 else tables[0]
+    columns = [column_name for column_name in DASHBOARD_COLUMNS if column_name in table.column_names]
+    if 'Order key' in table.column_names:
+        # Keep the last row of each order key, and every row without one
+        keys = table['Order key'].combine_chunks()
+        rows = pa.table({'key': keys, 'row': np.arange(table.num_rows)})
+        last_rows = rows.group_by('key').aggregate([('row', 'max')])
+        keep = pc.is_null(keys).to_numpy(zero_copy_only=False)
+        keep[last_rows['row_max'].to_numpy()] = True
+        table = table.filter(pa.array(keep))
+    if 'Customer' in columns:
+        table = table.filter(pc.fill_null(pc.equal(table['Customer'], TARGET_CUSTOMER), False))
+    
+    picked = table['Picked on']
+    delivered = table['Delivered on']
+    
+    # Hours as pandas computes them: nanoseconds to seconds, then to hours
+    nanos = pc.cast(pc.subtract(delivered, picked), pa.int64())
+    hours = pc.divide(pc.divide(pc.cast(nanos, pa.float64()), 1e9), 3600.0)
+    
+    # Bucket i holds edges[i-1] < hours <= edges[i], the same split as assign_buckets
+    bucket = pa.array(np.zeros(len(hours), dtype=np.int16))
+    for edge in edges:
+        bucket = pc.add(bucket, pc.cast(pc.greater(hours, float(edge)), pa.int16()))
+    
+    frame = pa.table({
+        'day': pc.cast(pc.cast(picked, pa.date32()), pa.int32()),
+        'shift': pc.cast(pc.greater_equal(pc.hour(picked), 12), pa.int8()),
+        'bucket': pc.fill_null(bucket, -1),
+        # Durations are summed at float32 precision, as the pandas engine stores them
+        'duration': pc.cast(pc.cast(hours, pa.float32()), pa.float64()),
+    })
+    
+    has_pick = pc.is_valid(picked)
+    if 'Pickup Hub' in columns:
+        is_dc = pc.fill_null(pc.equal(table['Pickup Hub'], DC_HUB), False)
+        view_rows = {'DC': pc.and_(has_pick, is_dc), 'Store': pc.and_(has_pick, pc.invert(is_dc))}
+    else:
+        view_rows = {'DC': has_pick, 'Store': has_pick}
+    
+    labels = bucket_labels(edges)
+    aggregates = {}
+    for view, rows in view_rows.items():
+        grouped = frame.filter(rows).group_by(['day', 'shift', 'bucket']).aggregate([
+            ([], 'count_all'), ('duration', 'sum'), ('duration', 'count'),
+        ])
+        if grouped.num_rows == 0:
+            aggregates[view] = None
+            continue
+        aggregates[view] = aggregate_codes(
+            grouped['day'].to_numpy().astype(np.int64),
+            grouped['shift'].to_numpy().astype(np.int64) * 12,
+            grouped['bucket'].to_numpy().astype(np.int64),
+            labels,
+            orders=grouped['count_all'].to_numpy().astype(np.float64),
+            duration_sum=pc.fill_null(grouped['duration_sum'], 0.0).to_numpy(),
+            duration_count=grouped['duration_count'].to_numpy().astype(np.float64),
+        )
+    return aggregates
+
+def last_day(agg):
+    """Latest pick day covered by an aggregate"""
+    return agg['start'] + timedelta(days=len(agg['counts']) - 1)
+
+def prepare_dataset(df, edges=DEFAULT_BUCKET_EDGES, recorder=DISABLED_RECORDER):
+    """Durations, buckets and rollup cube for one parsed dataset.
+    
+    The prepared rows are sorted on 'Picked on' and the cube on 'Picked Day' so
+    date windows can be sliced with window_slice; the rows keep df's index
+    labels. cube.attrs['views'] records which views have any orders at all.
+    df itself is left untouched.
+    """
+    with recorder.stage('calculate_time_durations', rows_in=len(df)) as record:
+        prepared = calculate_time_durations(df.copy(), list(edges))
+        prepared = prepared.sort_values('Picked on', kind='stable', na_position='last')
+        record['rows_out'] = len(prepared)
+    with recorder.stage('build_rollup_cube', rows_in=len(prepared)) as record:
+        cube = build_rollup_cube(prepared)
+        cube = cube.sort_values('Picked Day', kind='stable', ignore_index=True)
+        record['rows_out'] = len(cube)
+    cube.attrs['views'] = {view: bool(mask.any()) for view, mask in view_masks(cube).items()}
+    return prepared, cube
+
+def day_number(timestamp):
+    """Days since 1970-01-01, matching the 'Picked Day' column"""
+    return int(np.datetime64(timestamp, 'D').astype(np.int64))
+
+def view_masks(df):
+    """Row masks for the DC (WD27) and Store (every other hub) views of the target customer"""
+    customer_rows = np.ones(len(df), dtype=bool)
+    if 'Customer' in df.columns:
+        customer_rows = (df['Customer'] == TARGET_CUSTOMER).to_numpy()
+    if 'Pickup Hub' not in df.columns:
+        return {'DC': customer_rows, 'Store': customer_rows}
+    is_dc = (df['Pickup Hub'] == DC_HUB).to_numpy()
+    return {'DC': customer_rows & is_dc, 'Store': customer_rows & ~is_dc}
+
+def summary_tables(agg, tab_name, start_date, end_date):
+    """Main, Morning and Afternoon tables of one view as (rows, total) pairs from build_summary.
+    
+    A table is None when the window has no orders for it.
+    """
+    tables = {}
+    for table_name, shift_type in (('Summary', None), ('Morning', 'Morning'), ('Afternoon', 'Afternoon')):
+        rows, total = build_summary(agg, tab_name, start_date, end_date, shift_type)
+        tables[table_name] = (rows, total) if rows is not None else None
+    return tables
+
+def summary_with_total(rows, total):
+    """One flat table with pick dates as 'MM-DD' text and the TOTAL row last, for report files"""
+    date_column = rows.columns[0]
+    rows = rows.assign(**{date_column: rows[date_column].dt.strftime('%m-%d')})
+    return pd.concat([rows, total], ignore_index=True)
+
+def create_main_summary(df, tab_name, start_date=None, end_date=None):
+    """Create main summary table with totals and percentages.
+    
+    Returns build_summary's (rows, total) frames. The window defaults to
+    default_window of the latest pick.
+    """
+    if df.empty:
+        return None, None
+    if start_date is None:
+        start_date, end_date = default_window(df['Picked on'].max())
+    return build_summary(aggregate_orders(df), tab_name, start_date, end_date)
+
+def create_shift_summary(df, shift_type, tab_name, start_date=None, end_date=None):
+    """Create summary table for specific shift (Morning or Afternoon)"""
+    if df.empty:
+        return None, None
+    if start_date is None:
+        start_date, end_date = default_window(df['Picked on'].max())
+    return build_summary(aggregate_orders(df), tab_name, start_date, end_date, shift_type)
+
+class LiveDataset:
+    """Orders from a drop folder, grown one export at a time.
+    
+    Each export is prepared on its own and its cube is folded into the running
+    cube. Orders it carries again replace their older rows, whose cells are
+    subtracted from the cube, so an update costs time in the new export and the
+    rows it replaces rather than in the whole history.
+    """
+    
+    def __init__(self, edges=DEFAULT_BUCKET_EDGES):
+        self.edges = list(edges)
+        self.merged = MergedUploads()
+        self.row_parts = []
+        self.cube = None
+        self.version = 0
+        self._lock = threading.Lock()
+    
+    def add(self, df, file_key, recorder=DISABLED_RECORDER):
+        """Merge one parsed export; returns the number of orders it adds.
+        
+        The export is prepared before anything is recorded, so one that fails
+        to prepare is not marked as merged and can be added again.
+        """
+        with self._lock:
+            if file_key in self.merged.file_keys:
+                return 0
+            rows, cube = prepare_dataset(df, self.edges, recorder)
+            with recorder.stage('merge_export', rows_in=len(rows)) as record:
+                dropped = self.merged.add(df, file_key)
+                new_part = len(self.row_parts)
+                self.row_parts.append(rows)
+                # New cells and the negated cells of replaced rows, folded into the running cube at once
+                removed = [self._take_out(part_number, labels) for part_number, labels in dropped.items()]
+                self.cube = combine_cubes(self.cube, cube, *removed)
+                record['rows_out'] = len(self.row_parts[new_part])
+            self.version += 1
+            replaced = sum(len(labels) for part_number, labels in dropped.items() if part_number != new_part)
+            return len(self.row_parts[new_part]) - replaced
+    
+    def _take_out(self, part_number, labels):
+        # Drop the rows from their part; returns their cells negated
+        rows = self.row_parts[part_number]
+        removed = build_rollup_cube(rows.loc[labels])
+        removed[['orders', 'duration_sum', 'duration_count']] *= -1
+        self.row_parts[part_number] = rows.drop(index=labels)
+        return removed
+    
+    def set_edges(self, edges, recorder=DISABLED_RECORDER):
+        """Re-prepare every export when the bucket edges change"""
+        with self._lock:
+            if list(edges) == self.edges:
+                return
+            self.edges = list(edges)
+            self.row_parts = []
+            self.cube = None
+            for part in self.merged.parts:
+                rows, cube = prepare_dataset(part, self.edges, recorder)
+                self.row_parts.append(rows)
+                self.cube = combine_cubes(self.cube, cube)
+            self.version += 1
+    
+    def snapshot(self):
+        """(row parts, cube, version) as of now; later exports do not change them"""
+        with self._lock:
+            return list(self.row_parts), self.cube, self.version
+    
+    def copy(self):
+        """Independent LiveDataset holding the same exports; the row frames and cube are shared, not copied.
+        
+        Adding exports to either one replaces frames rather than changing them,
+        so the other is left as it was.
+        """
+        with self._lock:
+            live = LiveDataset(self.edges)
+            live.merged = self.merged.copy()
+            live.row_parts = list(self.row_parts)
+            live.cube = self.cube
+            live.version = self.version
+            return live
+    
+    def nbytes(self):
+        """Approximate memory held by the prepared rows and the cube, the parsed exports not included"""
+        row_parts, cube, _ = self.snapshot()
+        return sum(frame_nbytes(rows) for rows in row_parts) + (frame_nbytes(cube) if cube is not None else 0)
+
+class UploadDatasets:
+    """LiveDatasets of selections of uploaded exports, shared between sessions.
+    
+    Keyed by bucket edges and the content hashes of the selected exports, in
+    order, and bounded to max_entries selections. A selection that extends a
+    cached one starts from a copy of it, so only the new exports are prepared;
+    the copies share their row frames. Cached datasets are never changed.
+    """
+    
+    def __init__(self, max_entries):
+        self._datasets = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+    
+    def get_or_build(self, edges, file_keys, load_exports, recorder=DISABLED_RECORDER):
+        """The LiveDataset of file_keys, building it on a miss.
+        
+        load_exports(keys) returns the parsed frames of the exports not merged
+        yet, in the order of keys.
+        """
+        edges, file_keys = tuple(edges), tuple(file_keys)
+        with self._lock:
+            live = self._datasets.get((edges, file_keys))
+            if live is not None:
+                return live
+            base = None
+            for end in range(len(file_keys) - 1, 0, -1):
+                base = self._datasets.get((edges, file_keys[:end]))
+                if base is not None:
+                    break
+        
+        # Prepare outside the lock so other sessions are not blocked
+        live = base.copy() if base is not None else LiveDataset(edges)
+        pending = list(file_keys[len(live.merged.file_keys):])
+        for key, df in zip(pending, load_exports(pending) if pending else []):
+            live.add(df, key, recorder)
+        with self._lock:
+            self._datasets[(edges, file_keys)] = live
+        return live
+
+class _DropHandler(FileSystemEventHandler):
+    """Queues CSV files created, moved or written in the drop folder"""
+    
+    def __init__(self, watcher):
+        self.watcher = watcher
+    
+    def on_created(self, event):
+        self.watcher.enqueue(event.src_path)
+    
+    def on_modified(self, event):
+        self.watcher.enqueue(event.src_path)
+    
+    def on_moved(self, event):
+        self.watcher.enqueue(event.dest_path)
+
+class DropFolderWatcher:
+    """Ingests CSV exports dropped into a folder into a LiveDataset and the store.
+    
+    Files already in the folder are ingested when the watcher starts. A file is
+    read once it has settled for DROP_SETTLE_SECONDS, and exports whose bytes
+    were ingested before are skipped. When a file already read grows, only the
+    rows appended to it are ingested. A file rewritten in place is ingested
+    again only if it has an order key column, so its rows replace the earlier
+    copies; without one every row would be counted twice, and it is skipped
+    with a warning.
+    """
+    
+    def __init__(self, drop_dir, live, save_to_store=True):
+        self.drop_dir = Path(drop_dir)
+        self.live = live
+        self.save_to_store = save_to_store
+        self.files_ingested = 0
+        self.last_error = None
+        # Path -> (bytes read, content hash of those bytes), to tell appends from rewrites
+        self._read_upto = {}
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._observer = None
+    
+    def enqueue(self, path):
+        """Queue a file for ingestion unless it is not a CSV or is already queued"""
+        path = Path(os.fsdecode(path))
+        if path.suffix.lower() != '.csv':
+            return
+        with self._pending_lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._queue.put(path)
+    
+    def start(self):
+        """Queue the files already present and start watching for new ones"""
+        self.drop_dir.mkdir(parents=True, exist_ok=True)
+        threading.Thread(target=self._ingest_loop, name='drop-folder-ingest', daemon=True).start()
+        for path in sorted(self.drop_dir.glob('*.csv'), key=lambda path: path.stat().st_mtime):
+            self.enqueue(path)
+        self._observer = Observer()
+        self._observer.schedule(_DropHandler(self), str(self.drop_dir), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        return self
+    
+    def stop(self):
+        """Stop watching and let the ingest thread finish"""
+        if self._observer is not None:
+            self._observer.stop()
+        self._queue.put(None)
+    
+    def _ingest_loop(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            try:
+                self._wait_until_settled(path)
+                with self._pending_lock:
+                    self._pending.discard(path)
+                if path.exists():
+                    self._ingest(path)
+            except Exception as e:
+                self.last_error = f"{path.name}: {e}"
+                logger.warning("Could not ingest %s: %s", path, e)
+    
+    def _wait_until_settled(self, path):
+        while path.exists():
+            idle = time.time() - path.stat().st_mtime
+            if idle >= DROP_SETTLE_SECONDS:
+                return
+            time.sleep(DROP_SETTLE_SECONDS - idle)
+    
+    def _ingest(self, path):
+        file_bytes = path.read_bytes()
+        read_upto = self._read_upto.get(path)
+        rewritten = read_upto is not None
+        export_bytes = file_bytes
+        if rewritten and len(file_bytes) >= read_upto[0] and content_hash(file_bytes[:read_upto[0]]) == read_upto[1]:
+            # Appended to: the header and the rows after what was read before
+            rewritten = False
+            appended = file_bytes[read_upto[0]:]
+            if not appended.strip():
+                return
+            export_bytes = file_bytes[:file_bytes.find(b'\n') + 1] + appended
+        
+        file_key = content_hash(export_bytes)
+        if file_key in self.live.merged.file_keys:
+            self._read_upto[path] = (len(file_bytes), content_hash(file_bytes))
+            return
+        df = load_upload(export_bytes)
+        if rewritten and order_key_columns(df) is None:
+            self._read_upto[path] = (len(file_bytes), content_hash(file_bytes))
+            raise ValueError("rewritten without an order key column to replace its earlier rows by; not ingested again")
+        new_orders = self.live.add(df, file_key)
+        if self.save_to_store:
+            ingest_into_store(df, file_key)
+        self._read_upto[path] = (len(file_bytes), content_hash(file_bytes))
+        self.files_ingested += 1
+        logger.info(json.dumps({'event': 'drop_ingested', 'file': path.name, 'rows': len(df), 'new_orders': new_orders}))
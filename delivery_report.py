@@ -0,0 +1,158 @@
+"""Headless batch report: DC and Store summaries for many exports, without Streamlit.
+
+Example:
+    python delivery_report.py exports/*.csv --out reports --format xlsx --workers 8
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from delivery_pipeline import (
+    DEFAULT_BUCKET_EDGES, ENGINES, aggregate_cube, arrow_summaries, content_hash, day_number, default_window,
+    last_day, load_upload, parse_bucket_edges, summary_tables, summary_with_total, view_masks, window_slice,
+    LiveDataset,
+)
+
+# Output formats supported by write_report
+REPORT_FORMATS = ['csv', 'xlsx', 'parquet']
+
+def build_report(path, edges=DEFAULT_BUCKET_EDGES, start_date=None, end_date=None, engine='pandas'):
+    """Summary tables for one export, keyed 'DC Summary', 'DC Morning', ... 'Store Afternoon'.
+    
+    The window defaults to default_window of the latest pick, as in the dashboard.
+    Tables without orders in the window are left out. The pandas engine merges
+    the export as the dashboard does, counting a repeated order once; engine
+    'arrow' computes the same tables with arrow_summaries.
+    """
+    with open(path, 'rb') as export:
+        file_bytes = export.read()
+    
+    if engine == 'arrow':
+        view_aggregates = arrow_summaries(file_bytes, edges)
+        covered = [agg for agg in view_aggregates.values() if agg is not None]
+        if not covered:
+            return {}
+        if start_date is None:
+            start_date, end_date = default_window(max(last_day(agg) for agg in covered))
+    else:
+        live = LiveDataset(edges)
+        live.add(load_upload(file_bytes), content_hash(file_bytes))
+        _, cube, _ = live.snapshot()
+        if cube.empty:
+            return {}
+        if start_date is None:
+            start_date, end_date = default_window(np.datetime64(int(cube['Picked Day'].iloc[-1]), 'D'))
+        window_cube = window_slice(cube, 'Picked Day', day_number(start_date), day_number(end_date) + 1)
+        view_aggregates = {view: aggregate_cube(window_cube, mask) for view, mask in view_masks(window_cube).items()}
+    
+    tables = {}
+    for view, agg in view_aggregates.items():
+        view_tables = summary_tables(agg, view, start_date, end_date)
+        for table_name, table in view_tables.items():
+            if table is not None:
+                tables[f'{view} {table_name}'] = summary_with_total(*table)
+    return tables
+
+def write_report(tables, out_dir, stem, fmt):
+    """Write report tables as one workbook (xlsx) or one file per table (csv, parquet); returns the paths"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    
+    if fmt == 'xlsx':
+        path = out_dir / f'{stem}.xlsx'
+        with pd.ExcelWriter(path) as writer:
+            for name, table in tables.items():
+                table.to_excel(writer, sheet_name=name, index=False)
+        return [path]
+    
+    paths = []
+    for name, table in tables.items():
+        path = out_dir / f"{stem}_{name.lower().replace(' ', '_')}.{fmt}"
+        if fmt == 'csv':
+            table.to_csv(path, index=False)
+        else:
+            table.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+def process_export(path, out_dir, fmt, edges, start_date, end_date, engine):
+    """Build and write the report for one export; runs in a worker process"""
+    tables = build_report(path, edges, start_date, end_date, engine)
+    return write_report(tables, out_dir, Path(path).stem, fmt)
+
+def expand_paths(paths):
+    """CSV files named on the command line, with directories expanded to the CSVs inside them"""
+    expanded = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            expanded.extend(sorted(path.glob('*.csv')))
+        else:
+            expanded.append(path)
+    return expanded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write DC and Store delivery summaries for many exports.")
+    parser.add_argument('paths', nargs='+', help="CSV exports, or directories of them")
+    parser.add_argument('--out', default='reports', help="output directory (default: reports)")
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='csv', help="report format (default: csv)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument('--start', type=pd.Timestamp, help="first pick date of the window, YYYY-MM-DD")
+    parser.add_argument('--end', type=pd.Timestamp, help="last pick date of the window, YYYY-MM-DD")
+    parser.add_argument(
+        '--buckets',
+        default=", ".join(f"{edge:g}" for edge in DEFAULT_BUCKET_EDGES),
+        help="comma-separated upper bucket edges in hours"
+    )
+    parser.add_argument('--engine', choices=ENGINES, default='pandas', help="summary engine (default: pandas)")
+    args = parser.parse_args(argv)
+    
+    if (args.start is None) != (args.end is None):
+        parser.error("--start and --end must be given together")
+    try:
+        edges = parse_bucket_edges(args.buckets)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.format == 'xlsx' and not any(importlib.util.find_spec(name) for name in ('openpyxl', 'xlsxwriter')):
+        parser.error("xlsx reports need openpyxl or xlsxwriter installed")
+    
+    paths = expand_paths(args.paths)
+    job_args = (args.out, args.format, edges, args.start, args.end, args.engine)
+    failures = 0
+    
+    if args.workers <= 1 or len(paths) == 1:
+        # No pool needed for a single export
+        results = []
+        for path in paths:
+            try:
+                results.append((path, process_export(path, *job_args), None))
+            except Exception as e:
+                results.append((path, None, e))
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(paths))) as pool:
+            futures = {pool.submit(process_export, path, *job_args): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    results.append((futures[future], future.result(), None))
+                except Exception as e:
+                    results.append((futures[future], None, e))
+    
+    for path, written, error in results:
+        if error is not None:
+            failures += 1
+            print(f"{path}: failed: {error}", file=sys.stderr)
+        elif not written:
+            print(f"{path}: no orders with a pick date, nothing written")
+        else:
+            print(f"{path}: wrote {len(written)} file(s) to {args.out}")
+    
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
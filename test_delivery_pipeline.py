@@ -0,0 +1,347 @@
+"""Regression checks for delivery_pipeline. Run with: python -m pytest -q"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import delivery_pipeline
+from benchmark import generate_batch
+from delivery_pipeline import (
+    DEFAULT_BUCKET_EDGES, DropFolderWatcher, LiveDataset, UploadDatasets, aggregate_cube, arrow_summaries,
+    arrow_table_summaries, assign_buckets, content_hash, delivery_percentiles, hub_scorecard, ingest_into_store,
+    load_upload, parse_bucket_edges, parse_date_column, prepare_dataset, rank_scorecard, read_arrow_export, read_store,
+    stream_summaries, view_masks,
+)
+from delivery_report import build_report
+
+HEADER = 'AWB,Customer,Pickup Hub,Picked on,Delivered on\n'
+
+def export_bytes(*rows):
+    """CSV export bytes from (AWB, Customer, Pickup Hub, Picked on, Delivered on) tuples"""
+    return (HEADER + ''.join(','.join(str(value) for value in row) + '\n' for row in rows)).encode()
+
+UNDELIVERED = export_bytes(
+    (1, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', ''),
+    (2, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST01', '09-21-2024 14:00', ''),
+)
+
+def test_parse_date_column_all_blank():
+    df = parse_date_column(pd.DataFrame({'Delivered on': [np.nan, np.nan]}), 'Delivered on')
+    assert pd.api.types.is_datetime64_any_dtype(df['Delivered on'])
+    assert df['Delivered on'].isna().all()
+
+def test_prepare_dataset_without_deliveries():
+    rows, cube = prepare_dataset(load_upload(UNDELIVERED))
+    assert rows['delivery_duration_hrs'].isna().all()
+    assert cube['orders'].sum() == 2
+    assert (cube['bucket'] == -1).all()
+    agg = aggregate_cube(cube, view_masks(cube)['DC'])
+    assert agg['counts'].sum() == 1 and agg['duration_count'].sum() == 0
+
+def test_stream_summaries_without_deliveries(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_bytes(UNDELIVERED)
+    running = stream_summaries(path, chunksize=1)
+    assert running['DC']['counts'].sum() == 1
+    assert running['Store']['counts'].sum() == 1
+
+def test_live_dataset_adds_undelivered_export():
+    live = LiveDataset()
+    assert live.add(load_upload(UNDELIVERED), 'undelivered') == 2
+    _, cube, version = live.snapshot()
+    assert version == 1 and cube['orders'].sum() == 2
+
+def test_load_upload_parses_delivery_times():
+    df = load_upload(export_bytes(
+        (1, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', '21-09-2024 13:30'),
+        (2, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST01', '09-21-2024 14:00', ''),
+    ))
+    assert pd.api.types.is_datetime64_any_dtype(df['Delivered on'])
+    assert df['Delivered on'].iloc[0] == pd.Timestamp('2024-09-21 13:30')
+    assert df.attrs['raw_nbytes'] > 0
+
+def test_quarter_hour_buckets_up_to_two_days():
+    edges = parse_bucket_edges(', '.join(f'{0.25 * i:g}' for i in range(1, 193)))
+    assert len(edges) == 192
+    assert list(assign_buckets([0.2, 10.0, 47.9, 60.0], edges)) == [0, 39, 191, 192]
+    rows, cube = prepare_dataset(load_upload(export_bytes(
+        (1, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', '23-09-2024 09:50'),
+    )), edges)
+    assert rows['delivery_time_bucket'].iloc[0] == '47.75-48Hrs'
+    assert list(cube['bucket']) == [191]
+
+def test_store_keeps_rows_without_key_and_matches_float_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(delivery_pipeline, 'STORE_DIR', tmp_path)
+    customer = 'WESTSIDE UNIT OF TRENT LIMITED'
+    exports = [
+        # One blank AWB makes pandas read the column as float
+        export_bytes(
+            (1, customer, 'WD27', '09-21-2024 10:00', ''),
+            ('', customer, 'WD27', '09-21-2024 11:00', ''),
+            ('', customer, 'ST01', '09-21-2024 12:00', ''),
+        ),
+        export_bytes((2, customer, 'WD27', '09-21-2024 13:00', '')),
+        # Order 1 again, now delivered
+        export_bytes((1, customer, 'WD27', '09-21-2024 10:00', '21-09-2024 12:00')),
+    ]
+    for file_bytes in exports:
+        assert ingest_into_store(load_upload(file_bytes), content_hash(file_bytes))
+    
+    stored = read_store('2024-09-21', '2024-09-21').sort_values('Picked on', ignore_index=True)
+    assert len(stored) == 4
+    assert stored['Delivered on'].iloc[0] == pd.Timestamp('2024-09-21 12:00')
+
+def test_store_reads_and_clears_around_unfinished_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(delivery_pipeline, 'STORE_DIR', tmp_path)
+    assert ingest_into_store(load_upload(UNDELIVERED), content_hash(UNDELIVERED))
+    # A write interrupted before its temp file was swapped in
+    partition_dir = tmp_path / 'pick_date=2024-09-21'
+    (partition_dir / '_part-0.parquet.tmp').write_bytes(b'partial')
+    (partition_dir / 'part-0.parquet.tmp').write_bytes(b'partial')
+    
+    file_bytes = export_bytes((3, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 15:00', ''))
+    assert ingest_into_store(load_upload(file_bytes), content_hash(file_bytes))
+    assert list(partition_dir.glob('*.tmp')) == []
+    (partition_dir / '_part-0.parquet.tmp').write_bytes(b'partial')
+    assert len(read_store('2024-09-21', '2024-09-21')) == 3
+
+@pytest.mark.parametrize('drop_index', [False, True], ids=['indexed', 'rebuilt'])
+def test_store_moves_order_whose_pick_date_changed(tmp_path, monkeypatch, drop_index):
+    monkeypatch.setattr(delivery_pipeline, 'STORE_DIR', tmp_path)
+    customer = 'WESTSIDE UNIT OF TRENT LIMITED'
+    exports = [
+        export_bytes((1, customer, 'WD27', '09-21-2024 10:00', ''), (2, customer, 'WD27', '09-21-2024 11:00', '')),
+        # Order 1 re-picked the next day, order 2 repeated within the export under two dates
+        export_bytes(
+            (1, customer, 'WD27', '09-22-2024 09:00', '22-09-2024 10:00'),
+            (2, customer, 'WD27', '09-22-2024 12:00', ''),
+            (2, customer, 'WD27', '09-21-2024 11:00', '21-09-2024 13:00'),
+        ),
+    ]
+    live = LiveDataset()
+    for file_bytes in exports:
+        if drop_index:
+            (tmp_path / '_order_index.parquet').unlink(missing_ok=True)
+        assert ingest_into_store(load_upload(file_bytes), content_hash(file_bytes))
+        live.add(load_upload(file_bytes), content_hash(file_bytes))
+    
+    stored = read_store('2024-09-20', '2024-09-23').sort_values('Picked on', ignore_index=True)
+    assert list(stored['Picked on']) == [pd.Timestamp('2024-09-21 11:00'), pd.Timestamp('2024-09-22 09:00')]
+    _, store_cube = prepare_dataset(stored)
+    assert cube_totals(live.snapshot()[1]) == cube_totals(store_cube)
+
+def cube_totals(cube):
+    """Orders and measured durations per bucket, for comparing cubes built different ways"""
+    return cube.groupby('bucket')[['orders', 'duration_count']].sum().to_dict()
+
+def test_live_dataset_later_copy_replaces_earlier(tmp_path, monkeypatch):
+    monkeypatch.setattr(delivery_pipeline, 'STORE_DIR', tmp_path)
+    customer = 'WESTSIDE UNIT OF TRENT LIMITED'
+    exports = [
+        export_bytes(
+            (5, customer, 'WD27', '09-21-2024 10:00', ''),
+            (6, customer, 'ST01', '09-21-2024 11:00', '21-09-2024 12:30'),
+        ),
+        # Order 5 again once delivered, and a repeat of order 7 inside one export
+        export_bytes(
+            (5, customer, 'WD27', '09-21-2024 10:00', '21-09-2024 13:30'),
+            (7, customer, 'ST01', '09-22-2024 09:00', ''),
+            (7, customer, 'ST01', '09-22-2024 09:00', '22-09-2024 09:30'),
+        ),
+    ]
+    live = LiveDataset()
+    assert live.add(load_upload(exports[0]), 'first') == 2
+    assert live.add(load_upload(exports[1]), 'second') == 1
+    for file_bytes in exports:
+        ingest_into_store(load_upload(file_bytes), content_hash(file_bytes))
+    
+    row_parts, cube, _ = live.snapshot()
+    assert sum(len(rows) for rows in row_parts) == 3
+    assert live.merged.duplicates == 2
+    assert cube['orders'].sum() == 3 and cube['duration_count'].sum() == 3
+    assert (cube['bucket'] >= 0).all()
+    
+    # The watch view and the store hold the same copy of every order
+    _, store_cube = prepare_dataset(read_store('2024-09-21', '2024-09-22'))
+    assert cube_totals(cube) == cube_totals(store_cube)
+
+def test_live_dataset_retries_export_that_failed_to_prepare(monkeypatch):
+    live = LiveDataset()
+    df = load_upload(UNDELIVERED)
+    with monkeypatch.context() as patched:
+        patched.setattr(delivery_pipeline, 'prepare_dataset', lambda *args: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            live.add(df, 'undelivered')
+    assert live.merged.file_keys == [] and live.snapshot()[1] is None
+    assert live.add(df, 'undelivered') == 2
+
+def test_live_dataset_matches_one_prepared_export():
+    orders = generate_batch(np.random.default_rng(7), 3000, 0, n_stores=20)
+    # Overlapping exports; the later copies of orders 500-899 are delivered sooner
+    exports = [orders.iloc[:1000], orders.iloc[800:2200], orders.iloc[2000:]]
+    updated = orders.iloc[500:900].copy()
+    picked = parse_date_column(updated[['Picked on']].copy(), 'Picked on')['Picked on']
+    updated['Delivered on'] = (picked + pd.Timedelta(minutes=30)).dt.strftime('%d-%m-%Y %H:%M')
+    exports.insert(1, updated)
+    
+    live = LiveDataset()
+    for number, export in enumerate(exports):
+        live.add(load_upload(export.to_csv(index=False).encode()), str(number))
+    row_parts, cube, _ = live.snapshot()
+    
+    combined = pd.concat(exports)
+    latest = combined[~combined['AWB'].duplicated(keep='last')]
+    _, expected = prepare_dataset(load_upload(latest.to_csv(index=False).encode()))
+    assert sum(len(rows) for rows in row_parts) == len(latest) == 3000
+    for view, mask in view_masks(cube).items():
+        merged, single = aggregate_cube(cube, mask), aggregate_cube(expected, view_masks(expected)[view])
+        assert np.array_equal(merged['counts'], single['counts'])
+        assert np.array_equal(merged['duration_count'], single['duration_count'])
+        assert np.allclose(merged['duration_sum'], single['duration_sum'])
+
+def test_upload_datasets_share_selections_and_extend_copies():
+    orders = generate_batch(np.random.default_rng(5), 2000, 0, n_stores=10)
+    exports = {str(number): load_upload(export.to_csv(index=False).encode())
+               for number, export in enumerate([orders.iloc[:1200], orders.iloc[1000:]])}
+    loaded = []
+    
+    def load_exports(keys):
+        loaded.extend(keys)
+        return [exports[key] for key in keys]
+    
+    datasets = UploadDatasets(max_entries=4)
+    first = datasets.get_or_build(DEFAULT_BUCKET_EDGES, ['0'], load_exports)
+    assert datasets.get_or_build(DEFAULT_BUCKET_EDGES, ['0'], load_exports) is first
+    both = datasets.get_or_build(DEFAULT_BUCKET_EDGES, ['0', '1'], load_exports)
+    assert loaded == ['0', '1']
+    # Extending a selection leaves the shared shorter one as it was
+    assert first.snapshot()[1]['orders'].sum() == 1200 and first.merged.duplicates == 0
+    assert both.snapshot()[1]['orders'].sum() == 2000 and both.merged.duplicates == 200
+    assert 0 < first.nbytes() < both.nbytes()
+
+def test_watcher_ingests_only_appended_rows(tmp_path):
+    customer = 'WESTSIDE UNIT OF TRENT LIMITED'
+    watcher = DropFolderWatcher(tmp_path, LiveDataset(), save_to_store=False)
+    keyed, keyless = tmp_path / 'keyed.csv', tmp_path / 'keyless.csv'
+    keyed.write_bytes(export_bytes((1, customer, 'WD27', '09-21-2024 10:00', '')))
+    keyless.write_bytes(UNDELIVERED.replace(b'AWB,', b'Ref,'))
+    watcher._ingest(keyed)
+    watcher._ingest(keyless)
+    
+    # Rows appended to both files, and a repeated event for a file that did not change
+    with open(keyed, 'ab') as export:
+        export.write(b'1,%s,WD27,09-21-2024 10:00,21-09-2024 11:00\n' % customer.encode())
+    with open(keyless, 'ab') as export:
+        export.write(b'3,%s,ST01,09-22-2024 10:00,\n' % customer.encode())
+    for path in (keyed, keyless, keyless):
+        watcher._ingest(path)
+    _, cube, _ = watcher.live.snapshot()
+    assert cube['orders'].sum() == 4 and cube['duration_count'].sum() == 1
+    
+    # Rewritten in place: keyed rows replace their earlier copies, keyless ones are refused
+    keyed.write_bytes(export_bytes((1, customer, 'WD27', '09-21-2024 10:00', '21-09-2024 12:00')))
+    watcher._ingest(keyed)
+    keyless.write_bytes(UNDELIVERED.replace(b'AWB,', b'Ref,').replace(b'14:00', b'15:00'))
+    with pytest.raises(ValueError):
+        watcher._ingest(keyless)
+    _, cube, _ = watcher.live.snapshot()
+    assert cube['orders'].sum() == 4 and cube['duration_count'].sum() == 1
+
+# Awkward rows both engines must agree on
+MESSY = export_bytes(
+    (5, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', ''),
+    ('', 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 11:00', '21-09-2024 12:00'),
+    ('', 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 11:30', ''),
+    (6, 'WESTSIDE UNIT OF TRENT LIMITED', '', '09-21-2024 12:00', '21-09-2024 15:00'),
+    (7, '', 'ST01', '09-22-2024 09:00', '22-09-2024 10:00'),
+    (8, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST01', '', '22-09-2024 10:00'),
+    (9, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST02', '09-22-2024 16:00', 'not a date'),
+    (10, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST02', '2024-09-23 08:15', '23-09-2024 20:45'),
+    # Order 5 again, delivered, and order 10 again at another hub
+    (5, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', '21-09-2024 13:30'),
+    (10, 'WESTSIDE UNIT OF TRENT LIMITED', 'ST03', '2024-09-23 08:15', '23-09-2024 09:00'),
+)
+
+@pytest.mark.parametrize('file_bytes', [MESSY, UNDELIVERED], ids=['messy', 'undelivered'])
+def test_arrow_engine_matches_pandas(file_bytes, tmp_path):
+    live = LiveDataset()
+    live.add(load_upload(file_bytes), content_hash(file_bytes))
+    _, cube, _ = live.snapshot()
+    arrow = arrow_summaries(file_bytes)
+    for view, mask in view_masks(cube).items():
+        pandas_agg = aggregate_cube(cube, mask)
+        if pandas_agg is None:
+            assert arrow[view] is None
+            continue
+        assert pandas_agg['start'] == arrow[view]['start']
+        assert np.array_equal(pandas_agg['counts'], arrow[view]['counts'])
+        assert np.array_equal(pandas_agg['duration_count'], arrow[view]['duration_count'])
+        assert np.allclose(pandas_agg['duration_sum'], arrow[view]['duration_sum'])
+    
+    path = tmp_path / 'export.csv'
+    path.write_bytes(file_bytes)
+    pandas_tables = build_report(path, engine='pandas')
+    arrow_tables = build_report(path, engine='arrow')
+    assert pandas_tables.keys() == arrow_tables.keys()
+    for name, table in pandas_tables.items():
+        pd.testing.assert_frame_equal(table, arrow_tables[name])
+
+def test_arrow_engine_counts_repeated_order_once():
+    arrow = arrow_summaries(MESSY)
+    # DC: order 5 once, two orders without an AWB
+    assert arrow['DC']['counts'].sum() == 3
+    # Store: orders 6 (no hub), 9 and 10 once; order 7 has no customer and 8 no pick time
+    assert arrow['Store']['counts'].sum() == 3
+
+def test_arrow_engine_matches_pandas_across_overlapping_exports():
+    orders = generate_batch(np.random.default_rng(11), 3000, 0, n_stores=20)
+    # Later exports carry orders 800-999 and 2000-2199 again, some delivered sooner
+    updated = orders.iloc[800:1000].copy()
+    picked = parse_date_column(updated[['Picked on']].copy(), 'Picked on')['Picked on']
+    updated['Delivered on'] = (picked + pd.Timedelta(minutes=45)).dt.strftime('%d-%m-%Y %H:%M')
+    exports = [
+        export.to_csv(index=False).encode()
+        for export in (orders.iloc[:1000], orders.iloc[1000:2200], updated, orders.iloc[2000:])
+    ] + [MESSY]
+    
+    live = LiveDataset()
+    for file_bytes in exports:
+        live.add(load_upload(file_bytes), content_hash(file_bytes))
+    _, cube, _ = live.snapshot()
+    arrow = arrow_table_summaries([read_arrow_export(file_bytes) for file_bytes in exports])
+    for view, mask in view_masks(cube).items():
+        pandas_agg = aggregate_cube(cube, mask)
+        assert pandas_agg['start'] == arrow[view]['start']
+        assert np.array_equal(pandas_agg['counts'], arrow[view]['counts'])
+        assert np.array_equal(pandas_agg['duration_count'], arrow[view]['duration_count'])
+        assert np.allclose(pandas_agg['duration_sum'], arrow[view]['duration_sum'])
+    
+    # The same two orders in two exports are two orders, not four
+    first, second = (export_bytes(
+        (1, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 10:00', delivered),
+        (2, 'WESTSIDE UNIT OF TRENT LIMITED', 'WD27', '09-21-2024 11:00', delivered),
+    ) for delivered in ('', '21-09-2024 12:00'))
+    arrow = arrow_table_summaries([read_arrow_export(first), read_arrow_export(second)])
+    assert arrow['DC']['counts'].sum() == 2 and arrow['DC']['duration_count'].sum() == 2
+
+def test_scorecard_ranks_only_pairs_with_enough_orders():
+    orders = generate_batch(np.random.default_rng(3), 20_000, 0, n_stores=20)
+    rows, _ = prepare_dataset(load_upload(orders.to_csv(index=False).encode()))
+    scorecard = hub_scorecard(rows)
+    assert scorecard['Orders'].sum() == rows['Picked on'].notna().sum()
+    ranked = rank_scorecard(scorecard, 'p90 Hrs', min_orders=200)
+    assert 0 < len(ranked) < len(scorecard)
+    assert (ranked['Orders'] >= 200).all()
+    assert list(ranked['Rank']) == list(range(1, len(ranked) + 1))
+    assert ranked['p90 Hrs'].is_monotonic_decreasing
+
+def test_percentiles_keep_days_of_different_years_apart():
+    customer = 'WESTSIDE UNIT OF TRENT LIMITED'
+    rows, _ = prepare_dataset(load_upload(export_bytes(
+        (1, customer, 'WD27', '01-02-2025 10:00', '02-01-2025 13:00'),
+        (2, customer, 'WD27', '12-30-2024 10:00', '30-12-2024 11:00'),
+        (3, customer, 'WD27', '12-30-2023 10:00', '30-12-2023 12:00'),
+        (4, customer, 'WD27', '', ''),
+    )))
+    percentiles = delivery_percentiles(rows, np.ones(len(rows), dtype=bool), 'Day')
+    assert list(percentiles['Day']) == [pd.Timestamp('2023-12-30'), pd.Timestamp('2024-12-30'), pd.Timestamp('2025-01-02')]
+    assert list(percentiles['p50']) == [2.0, 1.0, 3.0]